@@ -1,9 +1,21 @@
 import jwt
+import time
 import bcrypt
+import hashlib
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from fastapi import HTTPException, status
 import os
+from process_pool import ProcessPool
+
+def _hash_password(password: str, rounds: int) -> str:
+    """Hash a password at the given bcrypt cost (runs in a worker process)"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check_password(password: str, encoded_password: str) -> bool:
+    """Check a password against a bcrypt hash (runs in a worker process)"""
+    return bcrypt.checkpw(password.encode('utf-8'), encoded_password.encode('utf-8'))
 
 class AuthHandler:
     def __init__(self):
@@ -11,13 +23,50 @@ class AuthHandler:
         self.algorithm = "HS256"
         self.access_token_expire_minutes = 60 * 24  # 24 hours
 
-    def encode_password(self, password: str) -> str:
+        # bcrypt is CPU-bound, so it runs in a bounded process pool off the event loop
+        self.bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.hash_workers = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+        self.hash_queue_limit = int(os.getenv("BCRYPT_QUEUE_LIMIT", str(self.hash_workers * 8)))
+
+        self._pool = ProcessPool("bcrypt", self.hash_workers)
+        self._pending = 0
+
+        # token digest -> (exp timestamp, verified claims), least recently used first
+        self.token_cache_size = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+        self._verified_tokens: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def _run(self, func, *args):
+        """Run a bcrypt call in the pool, shedding load once the queue is full"""
+        if self._pending >= self.hash_workers + self.hash_queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self._pending += 1
+        try:
+            return await self._pool.run(func, *args)
+        finally:
+            self._pending -= 1
+
+    async def encode_password(self, password: str) -> str:
         """Hash password using bcrypt"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        return await self._run(_hash_password, password, self.bcrypt_rounds)
 
-    def verify_password(self, password: str, encoded_password: str) -> bool:
+    async def verify_password(self, password: str, encoded_password: str) -> bool:
         """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), encoded_password.encode('utf-8'))
+        return await self._run(_check_password, password, encoded_password)
+
+    def needs_rehash(self, encoded_password: str) -> bool:
+        """Whether a hash was made with a different cost than the configured one"""
+        try:
+            return int(encoded_password.split('$')[2]) != self.bcrypt_rounds
+        except (IndexError, ValueError):
+            return True
+
+    def close(self):
+        """Shut down the hashing pool"""
+        self._pool.shutdown()
 
     def encode_token(self, user_id: str, email: str, role: str) -> str:
         """Generate JWT token"""
@@ -32,8 +81,21 @@ class AuthHandler:
 
     def decode_token(self, token: str) -> Dict[str, Any]:
         """Decode and validate JWT token"""
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        cached = self._verified_tokens.get(digest)
+        if cached:
+            if cached[0] > time.time():
+                self._verified_tokens.move_to_end(digest)
+                return dict(cached[1])
+            # Expired: drop it and let jwt.decode produce the usual error
+            del self._verified_tokens[digest]
+
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            if self.token_cache_size > 0 and 'exp' in payload:
+                self._verified_tokens[digest] = (float(payload['exp']), dict(payload))
+                if len(self._verified_tokens) > self.token_cache_size:
+                    self._verified_tokens.popitem(last=False)
             return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(
@@ -37,11 +37,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 def require_roles(allowed_roles: List[UserRole]):
     """Decorator to require specific roles"""
+    # Built once per checker rather than on every request
+    allowed_values = frozenset(role.value for role in allowed_roles)
+    denied_detail = f"Access denied. Required roles: {[role.value for role in allowed_roles]}"
+
     def role_checker(current_user: dict = Depends(get_current_user)):
-        if current_user['role'] not in [role.value for role in allowed_roles]:
+        if current_user['role'] not in allowed_values:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Access denied. Required roles: {[role.value for role in allowed_roles]}"
+                detail=denied_detail
             )
         return current_user
     return role_checker
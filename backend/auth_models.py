@@ -89,6 +89,12 @@ class DocumentUpload(BaseModel):
     file_name: str
     file_data: str  # base64 encoded file data
 
+class ResumableUploadRequest(BaseModel):
+    application_id: str
+    document_type: DocumentType
+    file_name: str
+    total_size: int = Field(..., gt=0)  # bytes the client will send
+
 # Dashboard Models
 class CustomerStats(BaseModel):
     total_bookings: int
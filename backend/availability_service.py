@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Per-cleaner availability as day bitmaps
+
+Each cleaner_availability document holds one day's booked 30-minute
+slots as a bitmap, claimed atomically with $bit and $bitsAllClear. Run
+this module directly to fold bookings made before the bitmaps existed
+into them:
+
+    python availability_service.py
+"""
+
+import re
+import sys
+import asyncio
+from datetime import datetime, timedelta, date as date_type
+from typing import Dict, Any, List, Tuple, Optional
+import logging
+import numpy as np
+from bson.int64 import Int64
+from pymongo import UpdateOne, ASCENDING
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from database import database
+
+logger = logging.getLogger(__name__)
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+FULL_DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+MAX_SEARCH_DAYS = 62
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_TIME_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])?\s*$")
+
+class SlotConflictError(Exception):
+    """The requested slot is outside working hours or already booked"""
+
+def parse_time(value: str) -> int:
+    """Minutes after midnight for "14:30" or "2:30 PM" style times"""
+    match = _TIME_PATTERN.match(value or "")
+    if not match:
+        raise ValueError(f"Invalid time: {value}")
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2)), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid time: {value}")
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Invalid time: {value}")
+    return hour * 60 + minute
+
+def format_time(minutes: int) -> str:
+    """"HH:MM" for minutes after midnight"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def parse_date(value: str) -> date_type:
+    """Calendar date from an ISO "YYYY-MM-DD" string"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date: {value}")
+
+def span_mask(start_minutes: int, end_minutes: int) -> int:
+    """Bitmap of the slots covering [start, end) within one day"""
+    if start_minutes % SLOT_MINUTES or end_minutes % SLOT_MINUTES:
+        raise ValueError(f"Times must fall on {SLOT_MINUTES}-minute boundaries")
+    if not 0 <= start_minutes < end_minutes <= 24 * 60:
+        raise ValueError("Booking must start and end on the same day")
+    first, last = start_minutes // SLOT_MINUTES, end_minutes // SLOT_MINUTES
+    return ((1 << (last - first)) - 1) << first
+
+def booking_mask(time: str, hours: int) -> int:
+    """Bitmap of the slots a booking of `hours` starting at `time` occupies"""
+    if hours <= 0:
+        raise ValueError("Booking must last at least one hour")
+    start = parse_time(time)
+    return span_mask(start, start + hours * 60)
+
+def weekday_mask(cleaner: Dict[str, Any], weekday: int) -> int:
+    """Bitmap of a cleaner's working slots on a weekday (Monday is 0)"""
+    working_hours = cleaner.get("working_hours")
+    if not working_hours:
+        # Cleaners who never set hours take any time the booking form offers
+        return FULL_DAY_MASK
+    hours = working_hours.get(WEEKDAYS[weekday])
+    if not hours:
+        return 0
+    return span_mask(parse_time(hours[0]), parse_time(hours[1]))
+
+def working_mask(cleaner: Dict[str, Any], day: date_type) -> int:
+    """Bitmap of a cleaner's working slots on a given day"""
+    return weekday_mask(cleaner, day.weekday())
+
+class AvailabilityService:
+    """Per-cleaner, per-day slot bitmaps with atomic reservation"""
+
+    def __init__(self):
+        self._indexed = False
+
+    async def ensure_index(self):
+        """Make sure the unique (cleaner_id, date) index exists before the first reservation
+
+        Clash detection relies on a conflicting upsert failing on this index; without it the
+        upsert would insert a second bitmap for the day and double-book the cleaner.
+        """
+        if not self._indexed:
+            await database.availability.create_index([("cleaner_id", ASCENDING), ("date", ASCENDING)], unique=True, background=True)
+            self._indexed = True
+
+    async def booked_mask(self, cleaner_id: str, day: str) -> int:
+        """Slots already booked for a cleaner on a day"""
+        entry = await database.availability.find_one(
+            {"cleaner_id": cleaner_id, "date": parse_date(day).isoformat()},
+            {"_id": 0, "booked": 1}
+        )
+        return int(entry["booked"]) if entry else 0
+
+    async def is_free(self, cleaner: Dict[str, Any], day: str, time: str, hours: int) -> bool:
+        """Whether a cleaner is free for `hours` starting at `time` on `day`"""
+        mask = booking_mask(time, hours)
+        if mask & ~working_mask(cleaner, parse_date(day)):
+            return False
+        return not mask & await self.booked_mask(cleaner["id"], day)
+
+    async def reserve(self, cleaner: Dict[str, Any], day: str, time: str, hours: int) -> int:
+        """Atomically claim the slots for a booking, returning the claimed bitmap"""
+        mask = booking_mask(time, hours)
+        calendar_day = parse_date(day)
+        if mask & ~working_mask(cleaner, calendar_day):
+            raise SlotConflictError("Requested time is outside the cleaner's working hours")
+        await self.ensure_index()
+
+        query = {
+            "cleaner_id": cleaner["id"],
+            "date": calendar_day.isoformat(),
+            "booked": {"$bitsAllClear": Int64(mask)}
+        }
+        update = {
+            "$bit": {"booked": {"or": Int64(mask)}},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+
+        # Upsert creates the day on first booking; if the day exists but the
+        # slots clash, the filter misses and the insert hits the unique index
+        for upsert in (True, False):
+            try:
+                result = await database.availability.update_one(query, update, upsert=upsert)
+            except DuplicateKeyError:
+                continue  # lost a race to create the day, retry as a plain update
+            if result.matched_count or result.upserted_id is not None:
+                return mask
+            break
+
+        raise SlotConflictError("Cleaner is already booked at the requested time")
+
+    async def reserve_many(self, cleaner: Dict[str, Any], days: List[str], time: str, hours: int) -> Tuple[int, List[str], List[str]]:
+        """Claim the same slots on many days at once; returns (mask, reserved days, conflicting days)"""
+        mask = booking_mask(time, hours)
+        calendar_days = [parse_date(day) for day in days]
+        keys = [day.isoformat() for day in calendar_days]
+
+        # One read checks the whole series before anything is claimed
+        booked = {}
+        entries = database.availability.find(
+            {"cleaner_id": cleaner["id"], "date": {"$in": keys}},
+            {"_id": 0, "date": 1, "booked": 1}
+        )
+        async for entry in entries:
+            booked[entry["date"]] = int(entry["booked"])
+
+        candidates, conflicts = [], []
+        for key, day in zip(keys, calendar_days):
+            if mask & ~working_mask(cleaner, day) or mask & booked.get(key, 0):
+                conflicts.append(key)
+            else:
+                candidates.append(key)
+
+        if not candidates:
+            return mask, [], conflicts
+        await self.ensure_index()
+
+        # The same conditional upsert as reserve(), sent as one unordered batch
+        update = {
+            "$bit": {"booked": {"or": Int64(mask)}},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+        operations = [
+            UpdateOne(
+                {"cleaner_id": cleaner["id"], "date": key, "booked": {"$bitsAllClear": Int64(mask)}},
+                update,
+                upsert=True
+            )
+            for key in candidates
+        ]
+        failed = set()
+        try:
+            await database.availability.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+
+        reserved = [key for index, key in enumerate(candidates) if index not in failed]
+        conflicts.extend(candidates[index] for index in sorted(failed))
+        return mask, reserved, conflicts
+
+    async def release(self, cleaner_id: str, day: str, mask: int):
+        """Free previously reserved slots"""
+        await database.availability.update_one(
+            {"cleaner_id": cleaner_id, "date": parse_date(day).isoformat()},
+            {
+                "$bit": {"booked": {"and": Int64(FULL_DAY_MASK & ~mask)}},
+                "$set": {"updated_at": datetime.utcnow()}
+            }
+        )
+
+    async def release_bookings(self, booking_ids: List[str]) -> int:
+        """Free the slots held by cancelled or declined bookings; returns how many were released"""
+        released = 0
+        bookings = database.bookings.find(
+            {
+                "id": {"$in": list(booking_ids)},
+                "status": {"$in": ["cancelled", "declined"]},
+                "slot_mask": {"$exists": True},
+                "slots_released": {"$ne": True}
+            },
+            {"_id": 0, "id": 1, "cleaner_id": 1, "date": 1, "slot_mask": 1}
+        )
+        async for booking in bookings:
+            # Claim the release first so two callers never free the same slots twice
+            claimed = await database.bookings.update_one(
+                {"id": booking["id"], "slots_released": {"$ne": True}},
+                {"$set": {"slots_released": True}}
+            )
+            if claimed.modified_count:
+                await self.release(booking["cleaner_id"], booking["date"], int(booking["slot_mask"]))
+                released += 1
+        return released
+
+    async def backfill(self, hold_until: Optional[datetime] = None) -> Dict[str, int]:
+        """Fold upcoming bookings that predate the bitmaps into them and record their slot_mask"""
+        day_masks: Dict[Tuple[str, str], int] = {}
+        booking_updates = []
+        skipped = overlaps = 0
+
+        bookings = database.bookings.find(
+            {
+                "date": {"$gte": date_type.today().isoformat()},
+                "status": {"$nin": ["cancelled", "declined"]},
+                "slot_mask": {"$exists": False}
+            },
+            {"_id": 0, "id": 1, "cleaner_id": 1, "date": 1, "time": 1, "hours": 1, "status": 1}
+        )
+        async for booking in bookings:
+            try:
+                day = parse_date(booking["date"]).isoformat()
+                start = parse_time(booking["time"])
+                # Legacy times may be off the slot grid; round outward so overlaps still show
+                first = start - start % SLOT_MINUTES
+                end = min(start + int(booking["hours"]) * 60, 24 * 60)
+                mask = span_mask(first, end + (-end) % SLOT_MINUTES)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Skipping booking {booking.get('id')} in availability backfill: {e}")
+                skipped += 1
+                continue
+
+            key = (booking["cleaner_id"], day)
+            if day_masks.get(key, 0) & mask:
+                overlaps += 1
+            day_masks[key] = day_masks.get(key, 0) | mask
+
+            fields = {"slot_mask": mask}
+            if hold_until and booking["status"] == "pending_payment":
+                fields["hold_until"] = hold_until
+            booking_updates.append(UpdateOne(
+                {"id": booking["id"], "slot_mask": {"$exists": False}},
+                {"$set": fields}
+            ))
+
+        if day_masks:
+            await self.ensure_index()
+            now = datetime.utcnow()
+            await database.availability.bulk_write([
+                UpdateOne(
+                    {"cleaner_id": cleaner_id, "date": day},
+                    {"$bit": {"booked": {"or": Int64(mask)}}, "$set": {"updated_at": now}},
+                    upsert=True
+                )
+                for (cleaner_id, day), mask in day_masks.items()
+            ], ordered=False)
+        if booking_updates:
+            await database.bookings.bulk_write(booking_updates, ordered=False)
+
+        if overlaps:
+            logger.warning(f"{overlaps} existing bookings overlap another booking for the same cleaner")
+        return {"bookings": len(booking_updates), "days": len(day_masks), "skipped": skipped, "overlaps": overlaps}
+
+    async def search(self, cleaners: List[Dict[str, Any]], start_day: str, end_day: str, hours: int) -> List[Dict[str, Any]]:
+        """Free start times per day for each cleaner over a date range"""
+        first, last = parse_date(start_day), parse_date(end_day)
+        if last < first:
+            raise ValueError("End date must not be before start date")
+        days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+        if len(days) > MAX_SEARCH_DAYS:
+            raise ValueError(f"Search range is limited to {MAX_SEARCH_DAYS} days")
+        if not 0 < hours * 60 <= 24 * 60:
+            raise ValueError("Duration must be between 1 and 24 hours")
+        if not cleaners:
+            return []
+
+        cleaner_ids = [cleaner["id"] for cleaner in cleaners]
+        row_of = {cleaner_id: row for row, cleaner_id in enumerate(cleaner_ids)}
+        column_of = {day.isoformat(): column for column, day in enumerate(days)}
+
+        # One indexed read loads the booked bitmaps for the whole roster and range
+        booked = np.zeros((len(cleaners), len(days)), dtype="<u8")
+        entries = database.availability.find(
+            {
+                "cleaner_id": {"$in": cleaner_ids},
+                "date": {"$gte": first.isoformat(), "$lte": last.isoformat()}
+            },
+            {"_id": 0, "cleaner_id": 1, "date": 1, "booked": 1}
+        )
+        async for entry in entries:
+            column = column_of.get(entry["date"])
+            if column is not None:
+                booked[row_of[entry["cleaner_id"]], column] = int(entry["booked"])
+
+        weekly = np.array(
+            [[weekday_mask(cleaner, weekday) for weekday in range(7)] for cleaner in cleaners],
+            dtype="<u8"
+        )
+        free = weekly[:, [day.weekday() for day in days]] & ~booked
+
+        # Bit k survives only if slots k .. k + length - 1 are all free
+        starts = free.copy()
+        for offset in range(1, hours * 60 // SLOT_MINUTES):
+            starts &= free >> np.uint64(offset)
+
+        start_bits = np.unpackbits(
+            starts.view(np.uint8).reshape(len(cleaners), len(days), 8),
+            axis=-1,
+            bitorder="little"
+        )
+
+        results = []
+        for row, cleaner in enumerate(cleaners):
+            day_columns, slots = np.nonzero(start_bits[row])
+            if not len(slots):
+                continue
+            free_slots: Dict[str, List[str]] = {}
+            for column, slot in zip(day_columns.tolist(), slots.tolist()):
+                free_slots.setdefault(days[column].isoformat(), []).append(format_time(slot * SLOT_MINUTES))
+            results.append({"cleaner": cleaner, "free_slots": free_slots})
+
+        results.sort(key=lambda result: result["cleaner"].get("rating") or 0, reverse=True)
+        return results
+
+# Global instance
+availability_service = AvailabilityService()
+
+async def main():
+    """Backfill availability bitmaps from existing bookings and exit"""
+    # Imported here because booking_holds itself depends on this module
+    from booking_holds import booking_hold_sweeper
+
+    if not await database.connect():
+        logger.error("❌ Could not connect to MongoDB")
+        sys.exit(1)
+
+    try:
+        result = await availability_service.backfill(hold_until=booking_hold_sweeper.hold_until())
+        logger.info(
+            f"✅ Availability backfill complete ({result['bookings']} bookings on {result['days']} cleaner-days, "
+            f"{result['skipped']} skipped, {result['overlaps']} overlapping)"
+        )
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+import logging
+from database import database
+from booking_state_machine import booking_state_machine
+from availability_service import availability_service
+
+logger = logging.getLogger(__name__)
+
+class BookingHoldSweeper:
+    """Expire unpaid bookings so their reserved slots go back on the calendar"""
+
+    def __init__(self):
+        # How long a new unpaid booking holds its slots before checkout starts
+        self.hold_minutes = int(os.getenv("BOOKING_HOLD_MINUTES", "60"))
+        # Stripe checkout sessions live for 24 hours, so an open checkout holds that long
+        self.checkout_hold_minutes = int(os.getenv("BOOKING_CHECKOUT_HOLD_MINUTES", str(24 * 60)))
+        self.sweep_interval = float(os.getenv("BOOKING_HOLD_SWEEP_INTERVAL_SECONDS", "60"))
+        self.batch_size = 500
+
+        self._task: Optional[asyncio.Task] = None
+
+    def hold_until(self, minutes: Optional[int] = None) -> datetime:
+        """When a hold taken now should lapse"""
+        return datetime.utcnow() + timedelta(minutes=self.hold_minutes if minutes is None else minutes)
+
+    async def extend_for_checkout(self, booking_id: str) -> bool:
+        """Keep an unpaid booking's slots for as long as its checkout session can be paid
+
+        False if the booking is no longer awaiting payment (its hold may already have lapsed).
+        """
+        result = await database.bookings.update_one(
+            {"id": booking_id, "status": "pending_payment"},
+            {"$max": {"hold_until": self.hold_until(self.checkout_hold_minutes)}}
+        )
+        return result.matched_count > 0
+
+    async def expire(self, booking_ids: List[str], lapsed_before: Optional[datetime] = None) -> int:
+        """Cancel unpaid bookings and free their slots; returns how many were cancelled
+
+        With lapsed_before, a booking whose hold was extended in the meantime is left alone.
+        """
+        cancelled = await booking_state_machine.bulk_transition(
+            booking_ids,
+            "cancelled",
+            from_statuses=["pending_payment"],
+            match={"hold_until": {"$lt": lapsed_before}} if lapsed_before else None,
+            set_fields={"payment_status": "expired", "cancellation_reason": "hold_expired"}
+        )
+        await availability_service.release_bookings(booking_ids)
+        if cancelled:
+            logger.info(f"Expired {cancelled} unpaid bookings")
+        return cancelled
+
+    async def expire_checkouts(self, booking_ids: List[str]) -> int:
+        """Expire bookings after an abandoned checkout, unless another session can still pay them"""
+        live = await database.payment_transactions.find(
+            {
+                "booking_id": {"$in": list(booking_ids)},
+                "$or": [{"status": {"$in": ["initiated", "open"]}}, {"payment_status": "paid"}]
+            },
+            {"_id": 0, "booking_id": 1}
+        ).to_list(length=None)
+        live_ids = {transaction["booking_id"] for transaction in live}
+        return await self.expire([booking_id for booking_id in booking_ids if booking_id not in live_ids])
+
+    async def sweep(self) -> int:
+        """Expire every unpaid booking whose hold has lapsed"""
+        expired = 0
+        while True:
+            now = datetime.utcnow()
+            lapsed = await database.bookings.find(
+                {"status": "pending_payment", "hold_until": {"$lt": now}},
+                {"_id": 0, "id": 1}
+            ).limit(self.batch_size).to_list(length=self.batch_size)
+            if not lapsed:
+                return expired
+            # A checkout may have started since the read; its extended hold keeps the booking
+            expired += await self.expire([booking["id"] for booking in lapsed], lapsed_before=now)
+            if len(lapsed) < self.batch_size:
+                return expired
+
+    async def confirm_payments(self, booking_ids: List[str], confirmed_at: str) -> int:
+        """Confirm bookings whose checkout was paid; returns how many were confirmed
+
+        A payment that lands after its booking was cancelled or declined cannot take the
+        slots back (another customer may hold them), so it is flagged for refund instead.
+        """
+        confirmed = await booking_state_machine.bulk_transition(
+            booking_ids,
+            "confirmed",
+            from_statuses=["pending_payment"],
+            set_fields={"payment_status": "paid", "confirmed_at": confirmed_at}
+        )
+
+        stranded = await database.bookings.find(
+            {
+                "id": {"$in": list(booking_ids)},
+                "status": {"$in": ["cancelled", "declined"]},
+                "payment_status": {"$ne": "refund_required"}
+            },
+            {"_id": 0, "id": 1}
+        ).to_list(length=None)
+        if stranded:
+            stranded_ids = [booking["id"] for booking in stranded]
+            await database.bookings.update_many(
+                {"id": {"$in": stranded_ids}},
+                {"$set": {"payment_status": "refund_required", "updated_at": datetime.utcnow()}}
+            )
+            await database.payment_transactions.update_many(
+                {"booking_id": {"$in": stranded_ids}, "payment_status": "paid"},
+                {"$set": {"refund_required": True}}
+            )
+            logger.warning(f"Payment received for {len(stranded_ids)} bookings no longer held, flagged for refund: {stranded_ids}")
+        return confirmed
+
+    async def _run(self):
+        """Sweep on an interval"""
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Booking hold sweep error: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self):
+        """Start the background sweeper"""
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background sweeper"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+booking_hold_sweeper = BookingHoldSweeper()
@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+import logging
+from pymongo import ReturnDocument
+from database import database
+
+logger = logging.getLogger(__name__)
+
+# status -> statuses it may move to
+BOOKING_TRANSITIONS: Dict[str, List[str]] = {
+    "pending_payment": ["confirmed", "cancelled"],
+    "pending_acceptance": ["confirmed", "declined", "cancelled"],
+    "confirmed": ["in_progress", "cancelled"],
+    "in_progress": ["completed"],
+    "completed": [],
+    "declined": [],
+    "cancelled": [],
+}
+
+class BookingTransitionError(Exception):
+    """A booking could not be moved to the requested status"""
+
+    def __init__(self, booking_id: str, to_status: str, current_status: Optional[str] = None):
+        self.booking_id = booking_id
+        self.to_status = to_status
+        self.current_status = current_status  # None when the booking was not found
+        if current_status is None:
+            message = f"Booking {booking_id} not found"
+        else:
+            message = f"Booking {booking_id} cannot move from {current_status} to {to_status}"
+        super().__init__(message)
+
+class BookingStateMachine:
+    """Legal booking status transitions, each applied as one conditional update"""
+
+    def __init__(self, transitions: Dict[str, List[str]] = None):
+        self.transitions = transitions or BOOKING_TRANSITIONS
+
+    def sources_for(self, to_status: str, from_statuses: Optional[Iterable[str]] = None) -> List[str]:
+        """Statuses a booking may be in to move to to_status, optionally narrowed"""
+        if to_status not in self.transitions:
+            raise ValueError(f"Unknown booking status: {to_status}")
+        sources = [status for status, targets in self.transitions.items() if to_status in targets]
+        if from_statuses is not None:
+            allowed = set(from_statuses)
+            sources = [status for status in sources if status in allowed]
+        return sources
+
+    def _update(self, to_status: str, set_fields: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"$set": {
+            **(set_fields or {}),
+            "status": to_status,
+            "updated_at": datetime.utcnow()
+        }}
+
+    async def transition(
+        self,
+        booking_id: str,
+        to_status: str,
+        from_statuses: Optional[Iterable[str]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        set_fields: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Move one booking to to_status if its current status allows it, returning the updated booking"""
+        query = {
+            **(match or {}),
+            "id": booking_id,
+            "status": {"$in": self.sources_for(to_status, from_statuses)}
+        }
+        booking = await database.bookings.find_one_and_update(
+            query,
+            self._update(to_status, set_fields),
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if booking:
+            return booking
+
+        # Only failed transitions pay for a second read, to explain why
+        current = await database.bookings.find_one(
+            {**(match or {}), "id": booking_id},
+            {"_id": 0, "status": 1}
+        )
+        raise BookingTransitionError(booking_id, to_status, current.get("status") if current else None)
+
+    async def bulk_transition(
+        self,
+        booking_ids: List[str],
+        to_status: str,
+        from_statuses: Optional[Iterable[str]] = None,
+        match: Optional[Dict[str, Any]] = None,
+        set_fields: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """Move every listed booking whose status allows it; returns how many moved"""
+        if not booking_ids:
+            return 0
+        result = await database.bookings.update_many(
+            {
+                **(match or {}),
+                "id": {"$in": list(booking_ids)},
+                "status": {"$in": self.sources_for(to_status, from_statuses)}
+            },
+            self._update(to_status, set_fields)
+        )
+        return result.modified_count
+
+# Global instance
+booking_state_machine = BookingStateMachine()
@@ -0,0 +1,64 @@
+import os
+import time
+import asyncio
+from typing import Dict, Any, Callable, Awaitable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+def is_terminal(status: Dict[str, Any]) -> bool:
+    """Whether a checkout status can no longer change"""
+    return status.get("payment_status") == "paid" or status.get("status") == "expired"
+
+class CheckoutStatusCache:
+    """Coalesce concurrent checkout status polls and cache the answers briefly"""
+
+    def __init__(self):
+        self.pending_ttl = float(os.getenv("CHECKOUT_STATUS_PENDING_TTL_SECONDS", "3"))
+        self.terminal_ttl = float(os.getenv("CHECKOUT_STATUS_TERMINAL_TTL_SECONDS", "600"))
+        self.max_entries = 2048
+
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _prune(self):
+        """Drop expired entries once the cache grows past its bound"""
+        if len(self._entries) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for session_id in [sid for sid, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[session_id]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    async def _resolve(self, session_id: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run one upstream fetch and remember its result"""
+        try:
+            status = await fetch()
+            ttl = self.terminal_ttl if is_terminal(status) else self.pending_ttl
+            self._entries[session_id] = (time.monotonic() + ttl, status)
+            self._prune()
+            return status
+        finally:
+            self._inflight.pop(session_id, None)
+
+    async def get(self, session_id: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Cached status for a session, sharing a single in-flight fetch between callers"""
+        entry = self._entries.get(session_id)
+        if entry and entry[0] > time.monotonic():
+            return dict(entry[1])
+
+        task = self._inflight.get(session_id)
+        if task is None:
+            task = asyncio.create_task(self._resolve(session_id, fetch))
+            self._inflight[session_id] = task
+
+        # Shield so one caller disconnecting does not cancel the fetch for the others
+        return dict(await asyncio.shield(task))
+
+    def invalidate(self, session_id: str):
+        """Forget the cached status for a session"""
+        self._entries.pop(session_id, None)
+
+# Global instance
+checkout_status_cache = CheckoutStatusCache()
@@ -0,0 +1,173 @@
+import os
+import asyncio
+from typing import Dict, Any, List, Optional
+import logging
+from pymongo.errors import OperationFailure
+from database import database
+
+logger = logging.getLogger(__name__)
+
+# Server errors meaning change streams will never work here, as opposed to a lost or broken stream:
+# 40573 not a replica set, 40324 unknown $changeStream stage, 115 command not supported
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324, 115}
+
+class CleanerCache:
+    """In-memory cleaner roster kept fresh from a change stream, or a TTL refresh as fallback"""
+
+    def __init__(self):
+        self.ttl_seconds = float(os.getenv("CLEANER_CACHE_TTL_SECONDS", "60"))
+
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.id_by_email: Dict[str, str] = {}
+        self.id_by_object_id: Dict[Any, str] = {}
+        self.available_ids: Dict[str, None] = {}  # ordered set
+
+        self.warm = False
+        self.mode = "disabled"
+        self._task: Optional[asyncio.Task] = None
+
+    def _store(self, document: Dict[str, Any]):
+        """Insert or replace one cleaner in every index"""
+        cleaner_id = document.get("id")
+        if not cleaner_id:
+            return
+
+        self._remove(cleaner_id)
+        object_id = document.get("_id")
+        cleaner = {key: value for key, value in document.items() if key != "_id"}
+
+        self.by_id[cleaner_id] = cleaner
+        if object_id is not None:
+            self.id_by_object_id[object_id] = cleaner_id
+        if cleaner.get("email"):
+            self.id_by_email[cleaner["email"]] = cleaner_id
+        if cleaner.get("available"):
+            self.available_ids[cleaner_id] = None
+
+    def _remove(self, cleaner_id: str):
+        """Drop one cleaner from every index"""
+        cleaner = self.by_id.pop(cleaner_id, None)
+        if not cleaner:
+            return
+        if self.id_by_email.get(cleaner.get("email")) == cleaner_id:
+            del self.id_by_email[cleaner["email"]]
+        self.available_ids.pop(cleaner_id, None)
+        for object_id in [oid for oid, cid in self.id_by_object_id.items() if cid == cleaner_id]:
+            del self.id_by_object_id[object_id]
+
+    async def load(self):
+        """Replace the cache contents with the full roster"""
+        documents = await database.cleaners.find({}).to_list(length=None)
+
+        self.by_id, self.id_by_email, self.id_by_object_id, self.available_ids = {}, {}, {}, {}
+        for document in documents:
+            self._store(document)
+
+        self.warm = True
+        logger.info(f"Cleaner cache loaded {len(self.by_id)} cleaners")
+
+    def apply_change(self, change: Dict[str, Any]):
+        """Patch the cache from one change stream event"""
+        operation = change.get("operationType")
+
+        if operation in ("insert", "update", "replace"):
+            document = change.get("fullDocument")
+            if document:
+                self._store(document)
+                return
+            operation = "delete"  # removed before the update lookup ran
+
+        if operation == "delete":
+            object_id = change.get("documentKey", {}).get("_id")
+            cleaner_id = self.id_by_object_id.get(object_id)
+            if cleaner_id:
+                self._remove(cleaner_id)
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.warm = False
+
+    async def _refresh_periodically(self):
+        """Fallback when change streams are unavailable (e.g. a standalone server)"""
+        self.mode = "ttl"
+        while True:
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"Cleaner cache refresh failed: {e}")
+            await asyncio.sleep(self.ttl_seconds)
+
+    async def _run(self):
+        """Keep the cache in sync, resynchronising whenever the stream is interrupted"""
+        while True:
+            try:
+                async with database.cleaners.watch(full_document="updateLookup") as stream:
+                    # Open the stream before loading so no change in between is missed
+                    await stream.try_next()
+                    await self.load()
+                    self.mode = "change_stream"
+                    async for change in stream:
+                        self.apply_change(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                    # e.g. ChangeStreamHistoryLost: reopen the stream and reload
+                    logger.warning(f"Cleaner cache stream failed, resynchronising: {e}")
+                    self.warm = False
+                    await asyncio.sleep(5)
+                    continue
+                logger.info(f"Change streams unavailable, cleaner cache falls back to TTL refresh: {e}")
+                await self._refresh_periodically()
+            except Exception as e:
+                logger.warning(f"Cleaner cache stream interrupted: {e}")
+                self.warm = False
+                await asyncio.sleep(5)
+
+    def start(self):
+        """Warm the cache and start following changes in the background"""
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop following changes"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "disabled"
+
+    async def get_by_id(self, cleaner_id: str) -> Optional[Dict[str, Any]]:
+        """Cleaner by id, falling back to the database on a miss"""
+        cleaner = self.by_id.get(cleaner_id)
+        if cleaner is None:
+            document = await database.cleaners.find_one({"id": cleaner_id})
+            if not document:
+                return None
+            if self.warm:
+                self._store(document)
+            cleaner = self.by_id.get(cleaner_id) or document
+        return {key: value for key, value in cleaner.items() if key != "_id"}
+
+    async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Cleaner by email, falling back to the database on a miss"""
+        cleaner_id = self.id_by_email.get(email)
+        if cleaner_id:
+            return dict(self.by_id[cleaner_id])
+
+        document = await database.cleaners.find_one({"email": email})
+        if not document:
+            return None
+        if self.warm:
+            self._store(document)
+        return {key: value for key, value in document.items() if key != "_id"}
+
+    async def available_cleaners(self) -> List[Dict[str, Any]]:
+        """All available cleaners"""
+        if not self.warm:
+            return await database.cleaners.find({"available": True}, {"_id": 0}).to_list(length=None)
+        return [dict(self.by_id[cleaner_id]) for cleaner_id in self.available_ids]
+
+# Global instance
+cleaner_cache = CleanerCache()
@@ -0,0 +1,158 @@
+from typing import Dict, Any, List
+import logging
+from database import database
+from rating_service import average_rating
+
+logger = logging.getLogger(__name__)
+
+UPCOMING_STATUSES = ["confirmed", "in_progress"]
+DASHBOARD_SLICE_SIZE = 5
+FAVORITE_CLEANERS_LIMIT = 3
+
+def _count_if(condition: Dict[str, Any]) -> Dict[str, Any]:
+    """$sum accumulator counting documents that match an expression"""
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+def _paid_amount() -> Dict[str, Any]:
+    """$sum accumulator totalling total_amount over paid bookings"""
+    return {"$sum": {"$cond": [
+        {"$eq": ["$payment_status", "paid"]},
+        {"$ifNull": ["$total_amount", 0]},
+        0
+    ]}}
+
+def _slice(match: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """Facet branch returning the newest few bookings, optionally filtered"""
+    stages = [{"$match": match}] if match else []
+    return stages + [
+        {"$limit": DASHBOARD_SLICE_SIZE},
+        {"$project": {"_id": 0}}
+    ]
+
+class DashboardService:
+    """Build dashboard payloads with server-side aggregation pipelines"""
+
+    def customer_pipeline(self, customer_email: str) -> List[Dict[str, Any]]:
+        """Single-round-trip pipeline for the customer dashboard"""
+        return [
+            {"$match": {"customer_email": customer_email}},
+            {"$sort": {"created_at": -1}},
+            {"$facet": {
+                "stats": [
+                    {"$group": {
+                        "_id": None,
+                        "total_bookings": {"$sum": 1},
+                        "completed_bookings": _count_if({"$eq": ["$status", "completed"]}),
+                        "upcoming_bookings": _count_if({"$in": ["$status", UPCOMING_STATUSES]}),
+                        "total_spent": _paid_amount()
+                    }},
+                    {"$project": {"_id": 0}}
+                ],
+                "favorite_cleaners": [
+                    {"$match": {"cleaner_id": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$cleaner_id", "booking_count": {"$sum": 1}}},
+                    {"$sort": {"booking_count": -1, "_id": 1}},
+                    {"$limit": FAVORITE_CLEANERS_LIMIT},
+                    {"$lookup": {
+                        "from": "cleaners",
+                        "localField": "_id",
+                        "foreignField": "id",
+                        "as": "cleaner"
+                    }},
+                    {"$unwind": "$cleaner"},
+                    {"$project": {"_id": 0, "cleaner._id": 0}}
+                ],
+                "recent_bookings": _slice(),
+                "upcoming_bookings": _slice({"status": {"$in": UPCOMING_STATUSES}})
+            }}
+        ]
+
+    async def get_customer_dashboard(self, customer_email: str) -> Dict[str, Any]:
+        """Get customer dashboard stats and booking slices"""
+        results = await database.bookings.aggregate(
+            self.customer_pipeline(customer_email)
+        ).to_list(length=1)
+        facets = results[0] if results else {}
+
+        stats = (facets.get("stats") or [{}])[0]
+
+        return {
+            "stats": {
+                "total_bookings": stats.get("total_bookings", 0),
+                "completed_bookings": stats.get("completed_bookings", 0),
+                "upcoming_bookings": stats.get("upcoming_bookings", 0),
+                "total_spent": float(stats.get("total_spent", 0)),
+                "favorite_cleaners": facets.get("favorite_cleaners", [])
+            },
+            "recent_bookings": facets.get("recent_bookings", []),
+            "upcoming_bookings": facets.get("upcoming_bookings", [])
+        }
+
+    def cleaner_pipeline(self, cleaner_id: str, include_rating: bool = True) -> List[Dict[str, Any]]:
+        """Single-round-trip pipeline for the cleaner dashboard"""
+        rating_stages = [
+            {"$lookup": {
+                "from": "ratings",
+                "pipeline": [
+                    {"$match": {"cleaner_id": cleaner_id}},
+                    {"$group": {"_id": None, "average_rating": {"$avg": "$rating"}}}
+                ],
+                "as": "ratings"
+            }},
+            {"$addFields": {
+                "average_rating": {"$ifNull": [{"$arrayElemAt": ["$ratings.average_rating", 0]}, 0]}
+            }},
+            {"$project": {"ratings": 0}}
+        ] if include_rating else []
+
+        return [
+            {"$match": {"cleaner_id": cleaner_id}},
+            {"$sort": {"created_at": -1}},
+            {"$facet": {
+                "stats": [
+                    {"$group": {
+                        "_id": None,
+                        "total_jobs": {"$sum": 1},
+                        "completed_jobs": _count_if({"$eq": ["$status", "completed"]}),
+                        "upcoming_jobs": _count_if({"$in": ["$status", UPCOMING_STATUSES]}),
+                        "total_earnings": _paid_amount(),
+                        "pending_requests": _count_if({"$eq": ["$status", "pending_acceptance"]})
+                    }},
+                    {"$project": {"_id": 0}},
+                    *rating_stages
+                ],
+                "recent_jobs": _slice(),
+                "upcoming_jobs": _slice({"status": {"$in": UPCOMING_STATUSES}}),
+                "pending_jobs": _slice({"status": "pending_acceptance"})
+            }}
+        ]
+
+    async def get_cleaner_dashboard(self, cleaner: Dict[str, Any]) -> Dict[str, Any]:
+        """Get cleaner dashboard stats and job slices"""
+        # Cleaners with running rating aggregates skip the ratings join
+        running_average = average_rating(cleaner)
+        results = await database.bookings.aggregate(
+            self.cleaner_pipeline(cleaner["id"], include_rating=running_average is None)
+        ).to_list(length=1)
+        facets = results[0] if results else {}
+
+        stats = (facets.get("stats") or [{}])[0]
+        if running_average is not None:
+            stats["average_rating"] = running_average
+
+        return {
+            "stats": {
+                "total_jobs": stats.get("total_jobs", 0),
+                "completed_jobs": stats.get("completed_jobs", 0),
+                "upcoming_jobs": stats.get("upcoming_jobs", 0),
+                "total_earnings": float(stats.get("total_earnings", 0)),
+                "average_rating": round(stats.get("average_rating", 0), 1),
+                "pending_requests": stats.get("pending_requests", 0)
+            },
+            "recent_jobs": facets.get("recent_jobs", []),
+            "upcoming_jobs": facets.get("upcoming_jobs", []),
+            "pending_jobs": facets.get("pending_jobs", [])
+        }
+
+# Global instance
+dashboard_service = DashboardService()
@@ -0,0 +1,125 @@
+import os
+import asyncio
+import logging
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure
+
+logger = logging.getLogger(__name__)
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.getenv("DB_NAME", "tatiscleaners_production")
+
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+IS_PRODUCTION = ENVIRONMENT.lower() in ["production", "prod", "staging"]
+
+class Database:
+    """Async MongoDB client and collection handles shared by the API"""
+
+    def __init__(self):
+        self.client = None
+        self.db = None
+        self.connected = False
+
+        self.cleaners = None
+        self.bookings = None
+        self.payment_transactions = None
+        self.users = None
+        self.cleaner_applications = None
+        self.ratings = None
+        self.webhook_events = None
+        self.availability = None
+        self.recurring_bookings = None
+        self.document_uploads = None
+
+    def client_options(self) -> dict:
+        """Atlas-optimized connection settings"""
+        client_options = {
+            'serverSelectionTimeoutMS': 30000,  # 30 second timeout for Atlas
+            'connectTimeoutMS': 30000,
+            'socketTimeoutMS': 30000,
+            'maxPoolSize': 50,
+            'minPoolSize': 5,
+            'retryWrites': True,
+            'retryReads': True,
+            'w': 'majority',
+            'readPreference': 'primary'
+        }
+
+        # Additional Atlas-specific settings for production
+        if IS_PRODUCTION and 'mongodb+srv' in MONGO_URL:
+            client_options.update({
+                'ssl': True,
+                'tlsAllowInvalidCertificates': False,
+                'authSource': 'admin',
+                'compressors': 'snappy,zlib,zstd'
+            })
+            logger.info("Using Atlas-optimized connection settings")
+
+        return client_options
+
+    def open(self):
+        """Create the client and bind collection handles without any network I/O"""
+        if self.client:
+            return
+
+        self.client = AsyncIOMotorClient(MONGO_URL, **self.client_options())
+
+        # Initialize database and collections
+        self.db = self.client[DB_NAME]
+        self.cleaners = self.db.cleaners
+        self.bookings = self.db.bookings
+        self.payment_transactions = self.db.payment_transactions
+        self.users = self.db.users
+        self.cleaner_applications = self.db.cleaner_applications
+        self.ratings = self.db.ratings
+        self.webhook_events = self.db.stripe_webhook_events
+        self.availability = self.db.cleaner_availability
+        self.recurring_bookings = self.db.recurring_bookings
+        self.document_uploads = self.db.document_uploads
+
+    async def connect(self, retry_forever: bool = False) -> bool:
+        """Ping MongoDB with retry logic and flip the readiness flag once reachable"""
+        max_retries = 5 if not IS_PRODUCTION else 10  # More retries in production
+        retry_count = 0
+
+        self.open()
+
+        while retry_forever or retry_count < max_retries:
+            try:
+                logger.info(f"Attempting to connect to MongoDB (attempt {retry_count + 1})")
+
+                # Test the connection with timeout
+                await self.client.admin.command('ping')
+                logger.info("✅ MongoDB connection successful")
+                logger.info(f"Database '{DB_NAME}' initialized successfully")
+
+                self.connected = True
+                return True
+
+            except (ServerSelectionTimeoutError, ConnectionFailure) as e:
+                retry_count += 1
+                logger.error(f"MongoDB connection failed (attempt {retry_count}): {e}")
+
+                if not retry_forever and retry_count >= max_retries:
+                    logger.error("Failed to connect to MongoDB after maximum retries")
+                    return False
+
+                # Back off without blocking the event loop
+                await asyncio.sleep(min(2 ** retry_count, 30))
+
+            except Exception as e:
+                logger.error(f"Unexpected database error: {e}")
+                return False
+
+        return False
+
+    def close(self):
+        """Close the underlying client"""
+        if self.client:
+            self.client.close()
+        self.client = None
+        self.db = None
+        self.connected = False
+
+# Global instance
+database = Database()
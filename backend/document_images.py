@@ -0,0 +1,78 @@
+import os
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Set
+import logging
+from database import database
+from file_upload_service import file_upload_service
+from process_pool import ProcessPool
+from image_variants import PIL_AVAILABLE, IMAGE_EXTENSIONS, DEFAULT_VARIANT_SIZES, render_variants
+
+logger = logging.getLogger(__name__)
+
+class DocumentImagePipeline:
+    """Normalise uploaded ID images and render review-sized variants in the background"""
+
+    def __init__(self):
+        self.workers = int(os.getenv("DOCUMENT_IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+        self.quality = int(os.getenv("DOCUMENT_IMAGE_QUALITY", "85"))
+        self.sizes = dict(DEFAULT_VARIANT_SIZES)
+        self.shutdown_timeout = 30
+
+        self._pool = ProcessPool("document image", self.workers)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def is_image(self, file_info: Dict[str, Any]) -> bool:
+        """Whether a stored document looks like an image we can process"""
+        return Path(file_info.get("original_name", "")).suffix.lower() in IMAGE_EXTENSIONS
+
+    def schedule(self, application_id: str, document_type: str, file_info: Dict[str, Any]):
+        """Queue variant rendering for a freshly attached document"""
+        if not PIL_AVAILABLE or not file_info.get("sha256") or not self.is_image(file_info):
+            return
+        task = asyncio.create_task(self.process(application_id, document_type, file_info))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def process(self, application_id: str, document_type: str, file_info: Dict[str, Any]):
+        """Render the variants and record them on the application's documents entry"""
+        field = f"documents.{document_type}"
+        # Only touch the entry if it still holds this upload
+        query = {"application_id": application_id, f"{field}.sha256": file_info["sha256"]}
+        try:
+            variants = await self._pool.run(
+                render_variants,
+                file_info["file_path"],
+                str(file_upload_service.variant_dir),
+                file_info["sha256"],
+                self.sizes,
+                self.quality
+            )
+            await database.cleaner_applications.update_one(
+                query,
+                {
+                    "$set": {f"{field}.variants": variants, f"{field}.processed_at": datetime.utcnow()},
+                    "$unset": {f"{field}.processing_error": ""}
+                }
+            )
+            logger.info(f"Rendered {len(variants)} variants for {application_id} {document_type}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Image processing failed for {application_id} {document_type}: {e}")
+            await database.cleaner_applications.update_one(
+                query,
+                {"$set": {f"{field}.processing_error": str(e)}}
+            )
+
+    async def stop(self):
+        """Let queued renders finish, then shut the pool down"""
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+        self._pool.shutdown()
+
+# Global instance
+document_image_pipeline = DocumentImagePipeline()
@@ -1,13 +1,49 @@
+#!/usr/bin/env python3
+"""
+Document storage for cleaner applications
+
+Documents are stored once per distinct content under
+documents/blobs/<first two hex digits>/<sha256>, so a re-submitted scan
+costs no extra disk or writes. Blobs are shared: an application's
+documents.<type>.sha256 is a reference, and a blob is garbage once no
+application refers to it. Resumable uploads stage their bytes in
+temp/<upload_id>.upload and track progress in document_uploads until
+they are finalised into a blob. Run this module directly to collect
+garbage:
+
+    python file_upload_service.py gc [--dry-run]
+"""
+
 import os
+import sys
+import time
 import base64
 import uuid
-from typing import Dict, Any
+import asyncio
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, BinaryIO, Tuple, Optional, List
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
+from database import database
 
 logger = logging.getLogger(__name__)
 
+# none: leave flushing to the OS; file: fsync each file; full: also fsync its directory
+FSYNC_POLICIES = ("none", "file", "full")
+
+class DocumentTooLargeError(Exception):
+    """An upload exceeded the maximum document size"""
+
+class UploadOffsetError(Exception):
+    """A resumable upload chunk or finalise did not match the bytes received so far"""
+    
+    def __init__(self, message: str, received: int):
+        self.received = received
+        super().__init__(message)
+
 class FileUploadService:
     """Handle file uploads for cleaner applications"""
     
@@ -18,58 +54,475 @@ class FileUploadService:
         # Create subdirectories
         (self.upload_dir / "documents").mkdir(exist_ok=True)
         (self.upload_dir / "temp").mkdir(exist_ok=True)
+        self.blob_dir = self.upload_dir / "documents" / "blobs"
+        self.blob_dir.mkdir(exist_ok=True)
+        # Derived images (review size, thumbnails) named <sha256>_<variant>.jpg
+        self.variant_dir = self.upload_dir / "documents" / "variants"
+        self.variant_dir.mkdir(exist_ok=True)
+        
+        # Unreferenced blobs younger than this may belong to an upload still being recorded
+        self.gc_grace_seconds = int(os.getenv("DOCUMENT_GC_GRACE_SECONDS", "3600"))
+        self.upload_session_ttl = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+        self.chunk_lease_seconds = int(os.getenv("UPLOAD_CHUNK_LEASE_SECONDS", "300"))
+        
+        self.max_document_size = int(os.getenv("MAX_DOCUMENT_SIZE_BYTES", str(10 * 1024 * 1024)))
+        
+        self.fsync_policy = os.getenv("UPLOAD_FSYNC_POLICY", "none")
+        if self.fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"UPLOAD_FSYNC_POLICY must be one of {FSYNC_POLICIES}")
+        
+        # Disk I/O runs here so slow storage never blocks the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("UPLOAD_IO_WORKERS", "4")),
+            thread_name_prefix="file-io"
+        )
+        self._timings: Dict[str, Dict[str, float]] = {}
+    
+    async def _io(self, func, *args):
+        """Run a blocking file operation on the I/O pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    def _record(self, operation: str, started: float):
+        """Accumulate the duration of one storage operation"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timing = self._timings.setdefault(operation, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        timing["count"] += 1
+        timing["total_ms"] += elapsed_ms
+        timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+        logger.debug(f"File {operation} took {elapsed_ms:.1f} ms")
+    
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        """Per-operation count, average and maximum duration in milliseconds"""
+        return {
+            operation: {
+                "count": timing["count"],
+                "avg_ms": round(timing["total_ms"] / timing["count"], 2),
+                "max_ms": round(timing["max_ms"], 2)
+            }
+            for operation, timing in self._timings.items()
+        }
+    
+    def _sync_file(self, f: BinaryIO):
+        if self.fsync_policy != "none":
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _sync_dir(self, directory: Path):
+        if self.fsync_policy == "full":
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    
+    def _blob_path(self, sha256: str) -> Path:
+        """Where the blob with this digest lives"""
+        return self.blob_dir / sha256[:2] / sha256
+    
+    def _publish_blob(self, temp_path: Path, sha256: str) -> bool:
+        """Move a finished temp file to its blob path; False if the content was already stored"""
+        blob_path = self._blob_path(sha256)
+        if blob_path.exists():
+            temp_path.unlink(missing_ok=True)
+            # Refresh the mtime so a pending GC pass treats the blob as fresh
+            os.utime(blob_path)
+            return False
+        blob_path.parent.mkdir(exist_ok=True)
+        try:
+            os.replace(temp_path, blob_path)
+        except FileNotFoundError:
+            # A concurrent finalise of the same upload moved it first
+            if blob_path.exists():
+                return False
+            raise
+        self._sync_dir(blob_path.parent)
+        return True
+    
+    def _write_file(self, file_data: str) -> Tuple[str, int, bool]:
+        """Decode and store a base64 document; returns (sha256, size, newly written)"""
+        file_bytes = base64.b64decode(file_data)
+        sha256 = hashlib.sha256(file_bytes).hexdigest()
+        blob_path = self._blob_path(sha256)
+        if blob_path.exists():
+            os.utime(blob_path)
+            return sha256, len(file_bytes), False
+        
+        temp_path = self.upload_dir / "temp" / f"{uuid.uuid4()}.part"
+        with open(temp_path, "wb") as f:
+            f.write(file_bytes)
+            self._sync_file(f)
+        return sha256, len(file_bytes), self._publish_blob(temp_path, sha256)
+    
+    def _commit_file(self, f: BinaryIO, temp_path: Path, sha256: str) -> bool:
+        """Close a finished temp file and publish it as a blob"""
+        self._sync_file(f)
+        f.close()
+        return self._publish_blob(temp_path, sha256)
+    
+    def _discard_file(self, f: BinaryIO, temp_path: Path):
+        f.close()
+        temp_path.unlink(missing_ok=True)
+    
+    def _create_staging(self, staging_path: Path):
+        staging_path.touch(exist_ok=False)
+    
+    def _staging_path(self, upload_id: str) -> Path:
+        return self.upload_dir / "temp" / f"{upload_id}.upload"
+    
+    def _read_file(self, file_path: str) -> bytes:
+        with open(file_path, "rb") as f:
+            return f.read()
+    
+    def _remove_file(self, file_path: str) -> bool:
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+    
+    def _hash_file(self, file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _scan(self, directory: Path, pattern: str) -> List[Tuple[Path, float, int]]:
+        """(path, mtime, size) for each matching file, skipping ones removed mid-scan"""
+        entries = []
+        for path in directory.glob(pattern):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+    
+    def _file_info(self, sha256: str, file_size: int, file_name: str, document_type: str) -> Dict[str, Any]:
+        return {
+            'file_id': str(uuid.uuid4()),
+            'original_name': file_name,
+            'stored_name': sha256,
+            'file_path': str(self._blob_path(sha256)),
+            'file_size': file_size,
+            'sha256': sha256,
+            'document_type': document_type,
+            'upload_timestamp': datetime.utcnow().isoformat()
+        }
     
     async def save_document(self, file_data: str, file_name: str, application_id: str, document_type: str) -> Dict[str, Any]:
         """Save uploaded document"""
+        started = time.perf_counter()
         try:
-            # Decode base64 file data
-            file_bytes = base64.b64decode(file_data)
-            
-            # Generate unique filename
-            file_extension = Path(file_name).suffix
-            unique_filename = f"{application_id}_{document_type}_{uuid.uuid4()}{file_extension}"
+            # Decode and store the content off the event loop
+            sha256, file_size, written = await self._io(self._write_file, file_data)
             
-            # Save file
-            file_path = self.upload_dir / "documents" / unique_filename
-            with open(file_path, "wb") as f:
-                f.write(file_bytes)
-            
-            logger.info(f"Document saved: {unique_filename}")
-            
-            return {
-                'file_id': str(uuid.uuid4()),
-                'original_name': file_name,
-                'stored_name': unique_filename,
-                'file_path': str(file_path),
-                'file_size': len(file_bytes),
-                'document_type': document_type,
-                'upload_timestamp': datetime.utcnow().isoformat()
-            }
+            logger.info(f"Document {'saved' if written else 'deduplicated'} for {application_id}: {sha256}")
             
+            return self._file_info(sha256, file_size, file_name, document_type)
+        
         except Exception as e:
             logger.error(f"File upload error: {e}")
             raise Exception(f"Failed to upload document: {str(e)}")
+        finally:
+            self._record("save", started)
+    
+    async def save_document_stream(self, chunks: AsyncIterator[bytes], file_name: str, application_id: str, document_type: str) -> Dict[str, Any]:
+        """Save a document from a stream of chunks, hashing and size-checking as it arrives"""
+        started = time.perf_counter()
+        temp_path = self.upload_dir / "temp" / f"{uuid.uuid4()}.part"
+        digest = hashlib.sha256()
+        file_size = 0
+        
+        f = await self._io(open, temp_path, "wb")
+        try:
+            async for chunk in chunks:
+                file_size += len(chunk)
+                if file_size > self.max_document_size:
+                    raise DocumentTooLargeError(
+                        f"Document exceeds the {self.max_document_size} byte limit"
+                    )
+                digest.update(chunk)
+                await self._io(f.write, chunk)
+            
+            # Only complete uploads ever appear under documents/
+            sha256 = digest.hexdigest()
+            written = await self._io(self._commit_file, f, temp_path, sha256)
+        except BaseException:
+            await self._io(self._discard_file, f, temp_path)
+            raise
+        finally:
+            self._record("save_stream", started)
+        
+        logger.info(f"Document {'streamed' if written else 'deduplicated'} for {application_id}: {sha256} ({file_size} bytes)")
+        
+        return self._file_info(sha256, file_size, file_name, document_type)
+    
+    async def create_upload(self, application_id: str, user_id: str, document_type: str, file_name: str, total_size: int) -> Dict[str, Any]:
+        """Start a resumable upload of total_size bytes"""
+        if total_size > self.max_document_size:
+            raise DocumentTooLargeError(f"Document exceeds the {self.max_document_size} byte limit")
+        
+        now = datetime.utcnow()
+        upload = {
+            "upload_id": str(uuid.uuid4()),
+            "application_id": application_id,
+            "user_id": user_id,
+            "document_type": document_type,
+            "file_name": file_name,
+            "total_size": total_size,
+            "received": 0,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.upload_session_ttl)
+        }
+        await self._io(self._create_staging, self._staging_path(upload["upload_id"]))
+        await database.document_uploads.insert_one(upload)
+        upload.pop("_id", None)
+        return upload
+    
+    async def get_upload(self, upload_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """A resumable upload owned by this user, if it exists"""
+        return await database.document_uploads.find_one(
+            {"upload_id": upload_id, "user_id": user_id},
+            {"_id": 0}
+        )
+    
+    async def _current_offset(self, upload_id: str) -> int:
+        current = await database.document_uploads.find_one({"upload_id": upload_id}, {"_id": 0, "received": 1})
+        return current["received"] if current else 0
+    
+    async def write_chunk(self, upload: Dict[str, Any], offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """Write one chunk at offset into the staging file; returns the new received count"""
+        if upload.get("sha256"):
+            raise UploadOffsetError("Upload is already being finalised", upload["received"])
+        
+        # Claim the offset before touching the file so a duplicate or stale
+        # request can never overwrite bytes another writer is appending
+        writer = str(uuid.uuid4())
+        now = datetime.utcnow()
+        claimed = await database.document_uploads.update_one(
+            {
+                "upload_id": upload["upload_id"],
+                "received": offset,
+                "sha256": None,
+                "$or": [{"writer": None}, {"writer_until": {"$lt": now}}]
+            },
+            {"$set": {"writer": writer, "writer_until": now + timedelta(seconds=self.chunk_lease_seconds)}}
+        )
+        if not claimed.modified_count:
+            received = await self._current_offset(upload["upload_id"])
+            raise UploadOffsetError(f"Expected offset {received}", received)
+        
+        started = time.perf_counter()
+        position = offset
+        try:
+            f = await self._io(open, self._staging_path(upload["upload_id"]), "r+b")
+            try:
+                await self._io(f.seek, offset)
+                async for chunk in chunks:
+                    position += len(chunk)
+                    if position > upload["total_size"]:
+                        raise DocumentTooLargeError("Chunk runs past the declared upload size")
+                    await self._io(f.write, chunk)
+                await self._io(self._sync_file, f)
+            finally:
+                await self._io(f.close)
+                self._record("write_chunk", started)
+        except BaseException:
+            # Keep the old offset; the retry overwrites whatever was partially written
+            await database.document_uploads.update_one(
+                {"upload_id": upload["upload_id"], "writer": writer},
+                {"$set": {"writer": None}}
+            )
+            raise
+        
+        advanced = await database.document_uploads.update_one(
+            {"upload_id": upload["upload_id"], "writer": writer},
+            {"$set": {"received": position, "writer": None}}
+        )
+        if not advanced.modified_count:
+            received = await self._current_offset(upload["upload_id"])
+            raise UploadOffsetError(f"Chunk lease expired; expected offset {received}", received)
+        return position
+    
+    async def finalize_upload(self, upload: Dict[str, Any]) -> Dict[str, Any]:
+        """Publish a fully received upload as a blob and return its file info"""
+        if upload.get("file_info"):
+            return upload["file_info"]  # finalised before; the caller is retrying
+        if upload["received"] != upload["total_size"]:
+            raise UploadOffsetError(
+                f"Upload incomplete: {upload['received']} of {upload['total_size']} bytes",
+                upload["received"]
+            )
+        
+        started = time.perf_counter()
+        try:
+            # The staging file already is the assembled document: hash it and move it into place
+            staging_path = self._staging_path(upload["upload_id"])
+            sha256 = upload.get("sha256")
+            if not sha256:
+                sha256 = await self._record_digest(upload["upload_id"], staging_path)
+            # On a retry the staging file may already be the blob; publishing is idempotent
+            await self._io(self._publish_blob, staging_path, sha256)
+        finally:
+            self._record("finalize", started)
+        
+        file_info = self._file_info(sha256, upload["total_size"], upload["file_name"], upload["document_type"])
+        await database.document_uploads.update_one(
+            {"upload_id": upload["upload_id"], "sha256": sha256},
+            {"$set": {"file_info": file_info, "state": "finalized"}}
+        )
+        return file_info
+    
+    async def _record_digest(self, upload_id: str, staging_path: Path) -> str:
+        """Hash the staging file and record it on the session before anything moves"""
+        try:
+            sha256 = await self._io(self._hash_file, str(staging_path))
+        except FileNotFoundError:
+            sha256 = None  # a concurrent finalise already published it
+        if sha256:
+            # Only the first finaliser records its digest; later ones adopt it
+            await database.document_uploads.update_one(
+                {"upload_id": upload_id, "sha256": None},
+                {"$set": {"sha256": sha256, "state": "finalizing"}}
+            )
+        current = await database.document_uploads.find_one({"upload_id": upload_id}, {"_id": 0, "sha256": 1})
+        if not current or not current.get("sha256"):
+            raise FileNotFoundError(f"Staging file for upload {upload_id} is missing")
+        return current["sha256"]
+    
+    async def complete_upload(self, upload_id: str):
+        """Forget a resumable upload once its document is attached"""
+        await database.document_uploads.delete_one({"upload_id": upload_id})
     
     async def get_document(self, file_path: str) -> bytes:
         """Retrieve document by file path"""
+        started = time.perf_counter()
         try:
-            with open(file_path, "rb") as f:
-                return f.read()
+            return await self._io(self._read_file, file_path)
         except Exception as e:
             logger.error(f"File retrieval error: {e}")
             raise Exception(f"Failed to retrieve document: {str(e)}")
+        finally:
+            self._record("read", started)
+    
+    async def verify_document(self, file_info: Dict[str, Any]) -> bool:
+        """Whether a stored document still matches its recorded digest"""
+        if not file_info.get('sha256'):
+            return False
+        try:
+            return await self._io(self._hash_file, file_info['file_path']) == file_info['sha256']
+        except OSError:
+            return False
     
     async def delete_document(self, file_path: str) -> bool:
         """Delete document"""
+        started = time.perf_counter()
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # Blobs are shared and may be re-referenced by a concurrent upload at any
+            # moment, so only collect_garbage (with its grace period) removes them
+            if Path(file_path).parent.parent == self.blob_dir:
+                logger.info(f"Shared document left for garbage collection: {file_path}")
+                return False
+            if await self._io(self._remove_file, file_path):
                 logger.info(f"Document deleted: {file_path}")
                 return True
             return False
         except Exception as e:
             logger.error(f"File deletion error: {e}")
             return False
+        finally:
+            self._record("delete", started)
+    
+    async def reference_counts(self) -> Dict[str, int]:
+        """sha256 -> number of application documents pointing at it"""
+        pipeline = [
+            {"$project": {"_id": 0, "documents": {"$objectToArray": {"$ifNull": ["$documents", {}]}}}},
+            {"$unwind": "$documents"},
+            {"$match": {"documents.v.sha256": {"$type": "string"}}},
+            {"$group": {"_id": "$documents.v.sha256", "count": {"$sum": 1}}}
+        ]
+        counts = {}
+        async for entry in database.cleaner_applications.aggregate(pipeline):
+            counts[entry["_id"]] = entry["count"]
+        return counts
+    
+    async def collect_garbage(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Remove blobs no application references, plus abandoned temp files"""
+        references = await self.reference_counts()
+        blobs = await self._io(self._scan, self.blob_dir, "??/*")
+        cutoff = time.time() - self.gc_grace_seconds
+        
+        garbage = [
+            (blob_path, size)
+            for blob_path, mtime, size in blobs
+            if blob_path.name not in references and mtime < cutoff
+        ]
+        # Variants (<sha256>_<variant>.jpg) go with their source blob
+        variant_garbage = [
+            (variant_path, size)
+            for variant_path, mtime, size in await self._io(self._scan, self.variant_dir, "??/*")
+            if variant_path.name.split("_")[0] not in references and mtime < cutoff
+        ]
+        if not dry_run:
+            temp_dir = self.upload_dir / "temp"
+            # Staged resumable uploads outlive their session only if abandoned
+            staging_cutoff = time.time() - self.upload_session_ttl
+            abandoned = [
+                (temp_path, size)
+                for temp_path, mtime, size in await self._io(self._scan, temp_dir, "*.part")
+                if mtime < cutoff
+            ] + [
+                (staging_path, size)
+                for staging_path, mtime, size in await self._io(self._scan, temp_dir, "*.upload")
+                if mtime < staging_cutoff
+            ]
+            for path, _ in garbage + variant_garbage + abandoned:
+                await self._io(self._remove_file, str(path))
+        
+        result = {
+            "blobs": len(blobs),
+            "referenced": len(blobs) - len(garbage),
+            "removed": len(garbage),
+            "variants_removed": len(variant_garbage),
+            "freed_bytes": sum(size for _, size in garbage + variant_garbage),
+            "dry_run": dry_run
+        }
+        logger.info(f"Document GC: {result}")
+        return result
+    
+    def close(self):
+        """Wait for in-flight file operations and stop the I/O pool"""
+        self._executor.shutdown(wait=True)
 
 # Global instance
-file_upload_service = FileUploadService()
\ No newline at end of file
+file_upload_service = FileUploadService()
+
+async def main(dry_run: bool):
+    """Collect unreferenced document blobs"""
+    if not await database.connect():
+        logger.error("❌ Could not connect to MongoDB")
+        sys.exit(1)
+
+    try:
+        result = await file_upload_service.collect_garbage(dry_run=dry_run)
+        action = "would remove" if dry_run else "removed"
+        logger.info(
+            f"✅ {result['blobs']} blobs, {result['referenced']} referenced, "
+            f"{action} {result['removed']} ({result['freed_bytes']} bytes)"
+        )
+    finally:
+        file_upload_service.close()
+        database.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Manage stored application documents")
+    parser.add_argument("command", choices=["gc"])
+    parser.add_argument("--dry-run", action="store_true", help="report garbage without deleting it")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
\ No newline at end of file
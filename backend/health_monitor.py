@@ -0,0 +1,111 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, Optional
+import logging
+from database import database
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """Probe MongoDB in the background and cache the last result for health endpoints"""
+
+    def __init__(self):
+        self.probe_interval = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "15"))
+        self.stats_interval = float(os.getenv("HEALTH_STATS_INTERVAL_SECONDS", "300"))
+
+        self.database_status = "disconnected"
+        self.database_error: Optional[str] = None
+        self.ping_ms: Optional[float] = None
+        self.checked_at: Optional[str] = None
+        self.mongodb_version: Optional[str] = None
+        self.collections: Dict[str, int] = {}
+        self.stats_refreshed_at: Optional[str] = None
+
+        self._stats_due = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe(self):
+        """Ping the database and record the outcome"""
+        if not database.connected:
+            self.database_status = "disconnected"
+        else:
+            started = time.perf_counter()
+            try:
+                await database.client.admin.command('ping')
+                self.ping_ms = round((time.perf_counter() - started) * 1000, 2)
+                self.database_status = "connected"
+                self.database_error = None
+            except Exception as e:
+                logger.error(f"Database health check failed: {e}")
+                self.database_status = "error"
+                self.database_error = str(e)
+
+        self.checked_at = datetime.now().isoformat()
+
+    async def refresh_stats(self):
+        """Refresh server version and approximate collection sizes from metadata"""
+        if self.database_status != "connected":
+            return
+
+        try:
+            if not self.mongodb_version:
+                build_info = await database.db.command("buildInfo")
+                self.mongodb_version = build_info.get("version", "unknown")
+
+            self.collections = {
+                "cleaners": await database.cleaners.estimated_document_count(),
+                "bookings": await database.bookings.estimated_document_count(),
+                "users": await database.users.estimated_document_count()
+            }
+            self.stats_refreshed_at = datetime.now().isoformat()
+        except Exception as e:
+            logger.warning(f"Collection stats refresh failed: {e}")
+
+    async def _run(self):
+        """Probe on a fast cadence and refresh stats on a slow one"""
+        while True:
+            try:
+                await self.probe()
+                if self.database_status == "connected" and time.monotonic() >= self._stats_due:
+                    await self.refresh_stats()
+                    self._stats_due = time.monotonic() + self.stats_interval
+            except Exception as e:
+                logger.error(f"Health monitor error: {e}")
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self):
+        """Start the background prober"""
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background prober"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Last cached database health, without touching the database"""
+        snapshot = {
+            "database": self.database_status,
+            "database_test": "success" if self.mongodb_version else "failed",
+            "checked_at": self.checked_at,
+            "ping_ms": self.ping_ms
+        }
+        if self.database_error:
+            snapshot["database_error"] = self.database_error
+        if self.mongodb_version:
+            snapshot["mongodb_version"] = self.mongodb_version
+        if self.collections:
+            snapshot["collections"] = self.collections
+            snapshot["collections_refreshed_at"] = self.stats_refreshed_at
+        return snapshot
+
+# Global instance
+health_monitor = HealthMonitor()
@@ -0,0 +1,55 @@
+"""
+Image variant rendering for uploaded documents
+
+Runs inside the document image process pool, so it deliberately imports
+nothing from the application: spawned workers load only this module and
+Pillow.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Any
+
+# Pillow is optional; without it documents are simply served as uploaded
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+
+# variant name -> longest edge in pixels
+DEFAULT_VARIANT_SIZES = {"review": 1600, "thumbnail": 320}
+
+def render_variants(source_path: str, variant_dir: str, sha256: str, sizes: Dict[str, int], quality: int) -> Dict[str, Dict[str, Any]]:
+    """Write metadata-free JPEG variants of an image (runs in a worker process)"""
+    variants = {}
+    target_dir = Path(variant_dir) / sha256[:2]
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(source_path) as original:
+        # Let the JPEG decoder downscale while decoding; phone photos are far larger than any variant
+        original.draft("RGB", (max(sizes.values()),) * 2)
+        # Bake in the camera orientation before the EXIF that carries it is dropped
+        upright = ImageOps.exif_transpose(original).convert("RGB")
+
+    for name, longest_edge in sizes.items():
+        variant_path = target_dir / f"{sha256}_{name}.jpg"
+        if not variant_path.exists():
+            image = upright.copy()
+            image.thumbnail((longest_edge, longest_edge), Image.LANCZOS)
+            temp_path = target_dir / f"{variant_path.name}.{os.getpid()}.part"
+            # Saved without exif/icc arguments, so no source metadata is carried over
+            image.save(temp_path, "JPEG", quality=quality, optimize=True)
+            os.replace(temp_path, variant_path)
+        with Image.open(variant_path) as rendered:
+            width, height = rendered.size
+        variants[name] = {
+            "file_path": str(variant_path),
+            "width": width,
+            "height": height,
+            "file_size": variant_path.stat().st_size,
+            "content_type": "image/jpeg"
+        }
+    return variants
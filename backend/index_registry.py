@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Declarative MongoDB index registry
+
+Every index the API relies on is declared here once and applied in every
+environment. Run this module directly to apply the registry or to report
+drift against the live database:
+
+    python index_registry.py apply
+    python index_registry.py report
+"""
+
+import sys
+import asyncio
+import argparse
+import logging
+from typing import Dict, Any, List, Tuple
+from pymongo import ASCENDING, DESCENDING
+from database import database
+
+logger = logging.getLogger(__name__)
+
+# collection -> index declarations; "keys" follows create_index ordering.
+# "required" marks indexes correctness depends on: apply() fails if they cannot be built
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+        {"keys": [("role", ASCENDING)]},
+    ],
+    "cleaners": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("email", ASCENDING)], "sparse": True},
+        {"keys": [("available", ASCENDING)]},
+    ],
+    "bookings": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("customer_email", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]},
+        {"keys": [("cleaner_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("cleaner_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]},
+        {"keys": [("status", ASCENDING)]},
+        {"keys": [("created_at", DESCENDING)]},
+        {"keys": [("recurring_booking_id", ASCENDING), ("date", ASCENDING)], "sparse": True},
+        {"keys": [("status", ASCENDING), ("hold_until", ASCENDING)]},
+    ],
+    "payment_transactions": [
+        {"keys": [("session_id", ASCENDING)], "unique": True},
+        {"keys": [("booking_id", ASCENDING)]},
+    ],
+    "cleaner_applications": [
+        {"keys": [("application_id", ASCENDING)], "unique": True},
+        {"keys": [("user_id", ASCENDING)]},
+        {"keys": [("status", ASCENDING), ("created_at", DESCENDING), ("application_id", DESCENDING)]},
+        {"keys": [("created_at", DESCENDING), ("application_id", DESCENDING)]},
+    ],
+    "ratings": [
+        {"keys": [("cleaner_id", ASCENDING)]},
+        {"keys": [("booking_id", ASCENDING)]},
+    ],
+    "cleaner_availability": [
+        # One bitmap per cleaner-day; reservations rely on it to detect clashes
+        {"keys": [("cleaner_id", ASCENDING), ("date", ASCENDING)], "unique": True, "required": True},
+        {"keys": [("date", ASCENDING)]},
+    ],
+    "stripe_webhook_events": [
+        {"keys": [("event_id", ASCENDING)], "unique": True},
+        {"keys": [("state", ASCENDING), ("received_at", ASCENDING)]},
+    ],
+    "recurring_bookings": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("status", ASCENDING), ("materialized_until", ASCENDING)]},
+    ],
+    "document_uploads": [
+        {"keys": [("upload_id", ASCENDING)], "unique": True},
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+}
+
+class RequiredIndexError(Exception):
+    """An index the API cannot run safely without could not be created"""
+
+def _key_signature(keys) -> Tuple[Tuple[str, Any], ...]:
+    """Normalise an index key spec for comparison"""
+    return tuple((field, direction) for field, direction in keys)
+
+class IndexRegistry:
+    """Apply the declared indexes and report drift against the live database"""
+
+    def __init__(self, registry: Dict[str, List[Dict[str, Any]]] = None):
+        self.registry = registry or INDEX_REGISTRY
+
+    async def apply(self) -> Dict[str, List[str]]:
+        """Create every declared index in the background, skipping ones that fail
+
+        Raises RequiredIndexError once every index was attempted if a required one failed.
+        """
+        created: Dict[str, List[str]] = {}
+        missing_required = []
+        for collection_name, specs in self.registry.items():
+            collection = database.db[collection_name]
+            for spec in specs:
+                options = {key: value for key, value in spec.items() if key not in ("keys", "required")}
+                try:
+                    name = await collection.create_index(spec["keys"], background=True, **options)
+                    created.setdefault(collection_name, []).append(name)
+                except Exception as e:
+                    logger.warning(f"Index creation failed on {collection_name} {spec['keys']}: {e}")
+                    if spec.get("required"):
+                        missing_required.append(f"{collection_name} {spec['keys']}: {e}")
+
+        logger.info(f"Database indexes ensured on {len(created)} collections")
+        if missing_required:
+            raise RequiredIndexError(f"Required indexes could not be created: {'; '.join(missing_required)}")
+        return created
+
+    async def report(self) -> Dict[str, Dict[str, List[str]]]:
+        """Report missing, undeclared, unused and redundant indexes per collection"""
+        report: Dict[str, Dict[str, List[str]]] = {}
+        for collection_name, specs in self.registry.items():
+            collection = database.db[collection_name]
+            existing = await collection.index_information()
+            existing_keys = {
+                name: _key_signature(info["key"])
+                for name, info in existing.items()
+                if name != "_id_"
+            }
+            declared_keys = {_key_signature(spec["keys"]) for spec in specs}
+
+            usage = {}
+            try:
+                async for stats in collection.aggregate([{"$indexStats": {}}]):
+                    usage[stats["name"]] = stats.get("accesses", {}).get("ops", 0)
+            except Exception as e:
+                logger.warning(f"$indexStats unavailable for {collection_name}: {e}")
+
+            redundant = []
+            for name, keys in existing_keys.items():
+                if existing[name].get("unique"):
+                    continue
+                for other_name, other_keys in existing_keys.items():
+                    if other_name != name and len(other_keys) > len(keys) and other_keys[:len(keys)] == keys:
+                        redundant.append(f"{name} (prefix of {other_name})")
+                        break
+
+            report[collection_name] = {
+                "missing": [
+                    str(list(keys)) for keys in declared_keys
+                    if keys not in existing_keys.values()
+                ],
+                "undeclared": [
+                    name for name, keys in existing_keys.items()
+                    if keys not in declared_keys
+                ],
+                "unused": [
+                    name for name in existing_keys
+                    if name in usage and usage[name] == 0
+                ],
+                "redundant": redundant,
+            }
+
+        return report
+
+# Global instance
+index_registry = IndexRegistry()
+
+async def main(command: str):
+    """Apply the registry or print a drift report"""
+    if not await database.connect():
+        logger.error("❌ Could not connect to MongoDB")
+        sys.exit(1)
+
+    try:
+        if command == "apply":
+            created = await index_registry.apply()
+            for collection_name, names in created.items():
+                logger.info(f"{collection_name}: {', '.join(names)}")
+            return
+
+        drift_found = False
+        for collection_name, findings in (await index_registry.report()).items():
+            for category, entries in findings.items():
+                if entries:
+                    drift_found = drift_found or category == "missing"
+                    log = logger.warning if category == "missing" else logger.info
+                    log(f"{collection_name} {category}: {', '.join(entries)}")
+        if drift_found:
+            logger.error("❌ Declared indexes are missing")
+            sys.exit(2)
+        logger.info("✅ No missing indexes")
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Manage Tati's Cleaners MongoDB indexes")
+    parser.add_argument("command", choices=["apply", "report"], nargs="?", default="report")
+    args = parser.parse_args()
+    asyncio.run(main(args.command))
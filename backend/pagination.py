@@ -0,0 +1,71 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(created_at: Any, item_id: str) -> str:
+    """Build an opaque continuation token from the last item's sort key"""
+    is_datetime = isinstance(created_at, datetime)
+    payload = {
+        "c": created_at.isoformat() if is_datetime else created_at,
+        "d": is_datetime,
+        "i": item_id
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a continuation token back into its (created_at, id) sort key"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = payload["c"]
+        if payload.get("d"):
+            created_at = datetime.fromisoformat(created_at)
+        return {"created_at": created_at, "id": payload["i"]}
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+def parse_status_filter(status: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Turn a comma-separated status query parameter into a filter clause"""
+    if not status:
+        return None
+    statuses = [value.strip() for value in status.split(",") if value.strip()]
+    if not statuses:
+        return None
+    return statuses[0] if len(statuses) == 1 else {"$in": statuses}
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    id_field: str = "id",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Return one page of documents newest first, keyed on (created_at, id_field)"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if cursor:
+        position = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": position["created_at"]}},
+            {"created_at": position["created_at"], id_field: {"$lt": position["id"]}}
+        ]}]}
+
+    projection = {"_id": 0, **(projection or {})}
+    items: List[Dict[str, Any]] = await collection.find(query, projection).sort(
+        [("created_at", -1), (id_field, -1)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last.get("created_at"), last.get(id_field))
+
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,161 @@
+import os
+import json
+from typing import Dict, Any, List, Optional
+import logging
+import numpy as np
+from availability_service import parse_time, WEEKDAYS
+
+logger = logging.getLogger(__name__)
+
+# Service packages with updated pricing per cleaner
+SERVICE_PACKAGES = {
+    "regular_cleaning": {
+        "name": "Regular Cleaning",
+        "description": "Standard house cleaning service",
+        "base_price": 40.0  # per hour
+    },
+    "deep_cleaning": {
+        "name": "Deep Cleaning", 
+        "description": "Thorough deep cleaning service",
+        "base_price": 45.0  # per hour
+    },
+    "move_in_out": {
+        "name": "Move In/Out Cleaning",
+        "description": "Complete cleaning for moving",
+        "base_price": 70.0  # per hour
+    },
+    "janitorial_cleaning": {
+        "name": "Janitorial Cleaning",
+        "description": "Commercial janitorial services", 
+        "base_price": 70.0  # per hour
+    }
+}
+
+# Service areas
+SERVICE_AREAS = [
+    "Tempe", "Chandler", "Gilbert", "Mesa", 
+    "Phoenix", "Glendale", "Scottsdale", "Avondale"
+]
+
+# Pricing rules; every modifier is neutral unless overridden through the
+# PRICING_RULES environment variable (a JSON object with the same keys)
+DEFAULT_PRICING_RULES = {
+    "area_modifiers": {},  # area -> multiplier, missing areas are 1.0
+    "weekday_modifiers": {},  # weekday name -> multiplier
+    "evening_start": "18:00",
+    "evening_modifier": 1.0,
+    "recurrence_discounts": {  # fraction off the price of each occurrence
+        "once": 0.0,
+        "weekly": 0.0,
+        "biweekly": 0.0,
+        "monthly": 0.0
+    }
+}
+
+def load_pricing_rules() -> Dict[str, Any]:
+    """Default pricing rules merged with any PRICING_RULES override"""
+    rules = json.loads(json.dumps(DEFAULT_PRICING_RULES))
+    override = os.getenv("PRICING_RULES")
+    if override:
+        try:
+            for key, value in json.loads(override).items():
+                if isinstance(value, dict) and isinstance(rules.get(key), dict):
+                    rules[key].update(value)
+                else:
+                    rules[key] = value
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Ignoring invalid PRICING_RULES: {e}")
+    return rules
+
+class PricingEngine:
+    """Price bookings and batches of quote line items with shared rules"""
+
+    def __init__(self, rules: Optional[Dict[str, Any]] = None):
+        self.rules = rules or load_pricing_rules()
+        self.evening_start = parse_time(self.rules["evening_start"])
+
+        # Lookup tables so a whole batch is priced with array arithmetic
+        self.service_types = list(SERVICE_PACKAGES)
+        self.base_prices = np.array([SERVICE_PACKAGES[name]["base_price"] for name in self.service_types])
+        self.area_modifiers = np.array([
+            self.rules["area_modifiers"].get(area, 1.0) for area in SERVICE_AREAS
+        ])
+        self.weekday_modifiers = np.array([
+            self.rules["weekday_modifiers"].get(day, 1.0) for day in WEEKDAYS
+        ])
+
+    def quote_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Price many (service_type, location, date, hours[, time, recurrence]) line items at once"""
+        count = len(items)
+        service_index = np.zeros(count, dtype=int)
+        area_index = np.zeros(count, dtype=int)
+        day_numbers = np.zeros(count, dtype="datetime64[D]")
+        hours = np.zeros(count)
+        evening = np.zeros(count, dtype=bool)
+        discounts = np.zeros(count)
+        errors: List[Optional[str]] = [None] * count
+
+        service_lookup = {name: index for index, name in enumerate(self.service_types)}
+        area_lookup = {area: index for index, area in enumerate(SERVICE_AREAS)}
+        recurrence_discounts = self.rules["recurrence_discounts"]
+
+        for row, item in enumerate(items):
+            try:
+                if item.get("service_type") not in service_lookup:
+                    raise ValueError("Invalid service type")
+                if item.get("location") not in area_lookup:
+                    raise ValueError("Service area not supported")
+                recurrence = item.get("recurrence") or "once"
+                if recurrence not in recurrence_discounts:
+                    raise ValueError(f"Unsupported recurrence: {recurrence}")
+                if not item.get("hours") or item["hours"] <= 0:
+                    raise ValueError("Hours must be positive")
+
+                service_index[row] = service_lookup[item["service_type"]]
+                area_index[row] = area_lookup[item["location"]]
+                day_numbers[row] = np.datetime64(item["date"], "D")
+                hours[row] = item["hours"]
+                evening[row] = bool(item.get("time")) and parse_time(item["time"]) >= self.evening_start
+                discounts[row] = recurrence_discounts[recurrence]
+            except (ValueError, TypeError) as e:
+                errors[row] = str(e)
+
+        # 1970-01-01 was a Thursday, so shift by 3 to make Monday 0
+        weekdays = (day_numbers.astype(int) + 3) % 7
+
+        unit_prices = self.base_prices[service_index]
+        area_factors = self.area_modifiers[area_index]
+        time_factors = self.weekday_modifiers[weekdays] * np.where(evening, self.rules["evening_modifier"], 1.0)
+        totals = np.round(unit_prices * hours * area_factors * time_factors * (1 - discounts), 2)
+
+        quotes = []
+        for row, item in enumerate(items):
+            if errors[row]:
+                quotes.append({**item, "error": errors[row]})
+                continue
+            quotes.append({
+                **item,
+                "unit_price": float(unit_prices[row]),
+                "area_modifier": float(area_factors[row]),
+                "time_modifier": float(time_factors[row]),
+                "discount": float(discounts[row]),
+                "total_amount": float(totals[row])
+            })
+        return quotes
+
+    def quote(self, service_type: str, location: str, date: str, hours: int, time: Optional[str] = None, recurrence: str = "once") -> Dict[str, Any]:
+        """Price a single booking; raises ValueError for invalid input"""
+        quote = self.quote_many([{
+            "service_type": service_type,
+            "location": location,
+            "date": date,
+            "hours": hours,
+            "time": time,
+            "recurrence": recurrence
+        }])[0]
+        if "error" in quote:
+            raise ValueError(quote["error"])
+        return quote
+
+# Global instance
+pricing_engine = PricingEngine()
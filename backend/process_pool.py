@@ -0,0 +1,44 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ProcessPool:
+    """Lazily started process pool for CPU-bound work, rebuilt if a worker dies"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn keeps the workers free of the parent's threads and sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run func(*args) in a worker; retried once on a fresh pool if the old one broke"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # A worker was killed (OOM, crash); the executor refuses all work from now on
+            logger.warning(f"{self.name} process pool broke, restarting it")
+            if self._executor is executor:
+                self._executor = None
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def shutdown(self):
+        """Stop the workers without waiting for queued work"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
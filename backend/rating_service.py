@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Running rating aggregates for cleaners
+
+Each cleaner document carries rating_sum, rating_count and a per-star
+rating_histogram maintained with $inc, so recording a rating and reading
+the average are both O(1). Run this module directly to backfill the
+aggregates from the ratings collection for existing data.
+"""
+
+import sys
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+from pymongo import ReturnDocument, UpdateOne
+from database import database
+
+logger = logging.getLogger(__name__)
+
+RATING_VALUES = range(1, 6)
+
+def average_rating(cleaner: Dict[str, Any]) -> Optional[float]:
+    """Average rating from a cleaner's running aggregates, or None if it has none"""
+    count = cleaner.get("rating_count")
+    if not count:
+        return None
+    return round(cleaner.get("rating_sum", 0) / count, 1)
+
+class RatingService:
+    """Maintain running rating aggregates on cleaner documents"""
+
+    async def record_rating(self, cleaner_id: str, rating: int) -> Optional[float]:
+        """Fold a new rating into the cleaner's aggregates and refresh its average"""
+        cleaner = await database.cleaners.find_one_and_update(
+            {"id": cleaner_id},
+            {"$inc": {
+                "rating_sum": rating,
+                "rating_count": 1,
+                f"rating_histogram.{rating}": 1
+            }},
+            projection={"_id": 0, "rating_sum": 1, "rating_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not cleaner:
+            return None
+
+        # Only write the average if no newer rating landed in between;
+        # otherwise that rating's own update will store the fresher value
+        new_average = average_rating(cleaner)
+        await database.cleaners.update_one(
+            {"id": cleaner_id, "rating_count": cleaner["rating_count"]},
+            {"$set": {"rating": new_average}}
+        )
+        return new_average
+
+    async def backfill(self) -> int:
+        """Rebuild every cleaner's aggregates from the ratings collection"""
+        aggregates: Dict[str, Dict[str, Any]] = {}
+        cursor = database.ratings.aggregate([
+            {"$group": {
+                "_id": {"cleaner_id": "$cleaner_id", "rating": "$rating"},
+                "count": {"$sum": 1}
+            }}
+        ])
+        async for group in cursor:
+            cleaner_id = group["_id"].get("cleaner_id")
+            rating = group["_id"].get("rating")
+            if not cleaner_id or rating not in RATING_VALUES:
+                continue
+
+            entry = aggregates.setdefault(cleaner_id, {
+                "rating_sum": 0,
+                "rating_count": 0,
+                "rating_histogram": {str(value): 0 for value in RATING_VALUES}
+            })
+            entry["rating_sum"] += rating * group["count"]
+            entry["rating_count"] += group["count"]
+            entry["rating_histogram"][str(rating)] += group["count"]
+
+        if not aggregates:
+            return 0
+
+        operations = []
+        for cleaner_id, entry in aggregates.items():
+            entry["rating"] = average_rating(entry)
+            operations.append(UpdateOne({"id": cleaner_id}, {"$set": entry}))
+
+        result = await database.cleaners.bulk_write(operations, ordered=False)
+        logger.info(f"Backfilled rating aggregates for {result.modified_count} cleaners")
+        return result.modified_count
+
+# Global instance
+rating_service = RatingService()
+
+async def main():
+    """Backfill rating aggregates and exit"""
+    if not await database.connect():
+        logger.error("❌ Could not connect to MongoDB")
+        sys.exit(1)
+
+    try:
+        updated = await rating_service.backfill()
+        logger.info(f"✅ Rating backfill complete ({updated} cleaners updated)")
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
@@ -0,0 +1,260 @@
+import os
+import uuid
+import asyncio
+import calendar
+from datetime import datetime, date as date_type, timedelta
+from typing import Dict, Any, List, Optional
+import logging
+from database import database
+from cleaner_cache import cleaner_cache
+from pricing_engine import pricing_engine
+from availability_service import availability_service, parse_date, parse_time, booking_mask
+from booking_state_machine import booking_state_machine
+from booking_holds import booking_hold_sweeper
+
+logger = logging.getLogger(__name__)
+
+RECURRENCE_STEPS = {"weekly": 7, "biweekly": 14}
+RECURRENCES = list(RECURRENCE_STEPS) + ["monthly"]
+
+def _add_months(start: date_type, months: int) -> date_type:
+    """Same day of month `months` later, clamped to the month's last day"""
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return date_type(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+def occurrence_dates(start: date_type, recurrence: str, after: Optional[date_type], until: date_type) -> List[date_type]:
+    """Occurrences of a recurrence rule in (after, until]"""
+    dates = []
+    index = 0
+    while True:
+        if recurrence == "monthly":
+            day = _add_months(start, index)
+        else:
+            day = start + timedelta(days=RECURRENCE_STEPS[recurrence] * index)
+        if day > until:
+            return dates
+        if after is None or day > after:
+            dates.append(day)
+        index += 1
+
+class RecurringBookingService:
+    """Store recurrence rules once and materialise their bookings over a rolling horizon"""
+
+    def __init__(self):
+        self.horizon_days = int(os.getenv("RECURRING_HORIZON_DAYS", "56"))
+        self.refresh_interval = float(os.getenv("RECURRING_REFRESH_INTERVAL_SECONDS", "3600"))
+        # Each visit must be paid this long before it starts or its slots are released
+        self.payment_lead_hours = int(os.getenv("RECURRING_PAYMENT_LEAD_HOURS", "48"))
+        self._task: Optional[asyncio.Task] = None
+
+    def occurrence_hold_until(self, day: str, time: str) -> datetime:
+        """When an unpaid occurrence releases its slots: payment_lead_hours before the visit, at the earliest"""
+        starts_at = datetime.combine(parse_date(day), datetime.min.time()) + timedelta(minutes=parse_time(time))
+        # A visit inside the lead window still gets a normal hold to pay in
+        return max(booking_hold_sweeper.hold_until(), starts_at - timedelta(hours=self.payment_lead_hours))
+
+    async def create_contract(self, request: Dict[str, Any], cleaner: Dict[str, Any], customer: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a recurring contract for a customer and materialise its first horizon of bookings"""
+        if request["recurrence"] not in RECURRENCES:
+            raise ValueError(f"Unsupported recurrence: {request['recurrence']}")
+        start = parse_date(request["start_date"])
+        if start < date_type.today():
+            raise ValueError("Start date must not be in the past")
+        if request.get("end_date") and parse_date(request["end_date"]) < start:
+            raise ValueError("End date must not be before start date")
+        booking_mask(request["time"], request["hours"])
+        pricing_engine.quote(
+            request["service_type"], request["location"], request["start_date"],
+            request["hours"], request["time"], request["recurrence"]
+        )
+
+        contract = {
+            **request,
+            "id": str(uuid.uuid4()),
+            "cleaner_name": cleaner["name"],
+            "status": "active",
+            "materialized_until": None,
+            "skipped_dates": [],
+            "customer_name": customer["name"],
+            "customer_email": customer["email"],
+            "customer_phone": customer["phone"],
+            "created_by": customer["user_id"],
+            "created_at": datetime.now().isoformat()
+        }
+        await database.recurring_bookings.insert_one(contract)
+
+        result = await self.materialize(contract, cleaner)
+        return {"contract_id": contract["id"], **result}
+
+    async def materialize(self, contract: Dict[str, Any], cleaner: Dict[str, Any]) -> Dict[str, Any]:
+        """Create the contract's bookings up to the rolling horizon"""
+        horizon_end = date_type.today() + timedelta(days=self.horizon_days)
+        if contract.get("end_date"):
+            horizon_end = min(horizon_end, parse_date(contract["end_date"]))
+
+        previous = contract.get("materialized_until")
+        after = parse_date(previous) if previous else None
+        dates = occurrence_dates(parse_date(contract["start_date"]), contract["recurrence"], after, horizon_end)
+        if not dates:
+            return {"booking_ids": [], "skipped_dates": []}
+
+        # Claim the window first so concurrent extensions never double-book it
+        claimed = await database.recurring_bookings.update_one(
+            {"id": contract["id"], "status": "active", "materialized_until": previous},
+            {"$set": {"materialized_until": horizon_end.isoformat()}}
+        )
+        if not claimed.modified_count:
+            return {"booking_ids": [], "skipped_dates": []}
+
+        reserved: List[str] = []
+        mask = 0
+        try:
+            mask, reserved, conflicts = await availability_service.reserve_many(
+                cleaner, [day.isoformat() for day in dates], contract["time"], contract["hours"]
+            )
+
+            quotes = pricing_engine.quote_many([
+                {
+                    "service_type": contract["service_type"],
+                    "location": contract["location"],
+                    "date": day,
+                    "hours": contract["hours"],
+                    "time": contract["time"],
+                    "recurrence": contract["recurrence"]
+                }
+                for day in reserved
+            ])
+            errors = [quote["error"] for quote in quotes if "error" in quote]
+            if errors:
+                raise ValueError(errors[0])
+
+            created_at = datetime.now().isoformat()
+            bookings = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "recurring_booking_id": contract["id"],
+                    "service_type": contract["service_type"],
+                    "cleaner_id": contract["cleaner_id"],
+                    "cleaner_name": contract["cleaner_name"],
+                    "date": day,
+                    "time": contract["time"],
+                    "hours": contract["hours"],
+                    "location": contract["location"],
+                    "address": contract["address"],
+                    "customer_name": contract["customer_name"],
+                    "customer_email": contract["customer_email"],
+                    "customer_phone": contract["customer_phone"],
+                    "special_instructions": contract.get("special_instructions"),
+                    "total_amount": quote["total_amount"],
+                    "status": "pending_payment",
+                    "created_at": created_at,
+                    "payment_status": "pending",
+                    "slot_mask": mask,
+                    # Paid per visit through the normal checkout; unpaid visits expire via the hold sweep
+                    "hold_until": self.occurrence_hold_until(day, contract["time"])
+                }
+                for day, quote in zip(reserved, quotes)
+            ]
+            if bookings:
+                await database.bookings.insert_many(bookings)
+
+            if conflicts:
+                await database.recurring_bookings.update_one(
+                    {"id": contract["id"]},
+                    {"$addToSet": {"skipped_dates": {"$each": conflicts}}}
+                )
+        except Exception:
+            # Give the window back so the next extension retries it
+            for day in reserved:
+                await availability_service.release(contract["cleaner_id"], day, mask)
+            await database.recurring_bookings.update_one(
+                {"id": contract["id"], "materialized_until": horizon_end.isoformat()},
+                {"$set": {"materialized_until": previous}}
+            )
+            raise
+
+        logger.info(f"Recurring contract {contract['id']}: {len(bookings)} bookings, {len(conflicts)} skipped")
+        return {"booking_ids": [booking["id"] for booking in bookings], "skipped_dates": conflicts}
+
+    async def extend_all(self) -> int:
+        """Roll every active contract forward to the current horizon"""
+        horizon_end = (date_type.today() + timedelta(days=self.horizon_days)).isoformat()
+        contracts = await database.recurring_bookings.find(
+            {"status": "active", "$or": [
+                {"materialized_until": None},
+                {"materialized_until": {"$lt": horizon_end}}
+            ]},
+            {"_id": 0}
+        ).to_list(length=None)
+
+        created = 0
+        for contract in contracts:
+            if contract.get("end_date") and contract.get("materialized_until") and contract["materialized_until"] >= contract["end_date"]:
+                continue
+            cleaner = await cleaner_cache.get_by_id(contract["cleaner_id"])
+            if not cleaner:
+                logger.warning(f"Recurring contract {contract['id']} references a missing cleaner")
+                continue
+            try:
+                result = await self.materialize(contract, cleaner)
+                created += len(result["booking_ids"])
+            except Exception as e:
+                logger.error(f"Failed to extend recurring contract {contract['id']}: {e}")
+        return created
+
+    async def cancel_contract(self, contract_id: str) -> Dict[str, Any]:
+        """Stop a contract and cancel its unpaid future bookings
+
+        Visits already paid for stay booked and are returned separately so they can be
+        honoured or refunded deliberately rather than cancelled with the money kept.
+        """
+        await database.recurring_bookings.update_one(
+            {"id": contract_id},
+            {"$set": {"status": "cancelled", "cancelled_at": datetime.now().isoformat()}}
+        )
+        upcoming = await database.bookings.find(
+            {"recurring_booking_id": contract_id, "date": {"$gte": date_type.today().isoformat()}},
+            {"_id": 0, "id": 1, "status": 1, "payment_status": 1}
+        ).to_list(length=None)
+        booking_ids = [booking["id"] for booking in upcoming]
+
+        cancelled = await booking_state_machine.bulk_transition(
+            booking_ids,
+            "cancelled",
+            from_statuses=["pending_payment", "pending_acceptance"],
+            set_fields={"cancellation_reason": "contract_cancelled"}
+        )
+        await availability_service.release_bookings(booking_ids)
+        paid = [
+            booking["id"] for booking in upcoming
+            if booking.get("payment_status") == "paid" and booking.get("status") not in ("cancelled", "declined")
+        ]
+        return {"cancelled": cancelled, "paid_booking_ids": paid}
+
+    async def _run(self):
+        """Extend contracts periodically"""
+        while True:
+            try:
+                await self.extend_all()
+            except Exception as e:
+                logger.error(f"Recurring booking extension error: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start the background extender"""
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background extender"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+recurring_booking_service = RecurringBookingService()
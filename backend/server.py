@@ -1,11 +1,12 @@
-from fastapi import FastAPI, HTTPException, Request, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Request, Depends, UploadFile, File, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, FileResponse
 from fastapi.security import HTTPBearer
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure
 from datetime import datetime, timedelta
 import os
 import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from typing import List, Optional
 import logging
 from pydantic import BaseModel, Field
@@ -16,7 +17,24 @@ from auth_models import *
 from auth_handler import auth_handler
 from auth_middleware import get_current_user, require_customer, require_cleaner, require_admin, require_any_auth
 from background_check_service import background_check_service  # Use mock service by default
-from file_upload_service import file_upload_service
+from file_upload_service import file_upload_service, DocumentTooLargeError, UploadOffsetError
+from document_images import document_image_pipeline
+from rating_service import rating_service
+from dashboard_service import dashboard_service
+from database import database, MONGO_URL, DB_NAME, ENVIRONMENT, IS_PRODUCTION
+from index_registry import index_registry, RequiredIndexError
+from health_monitor import health_monitor
+from cleaner_cache import cleaner_cache
+from stripe_client import stripe_client, STRIPE_AVAILABLE, CheckoutSessionRequest
+from checkout_status_cache import checkout_status_cache, is_terminal
+from webhook_ledger import webhook_ledger
+from booking_state_machine import booking_state_machine, BookingTransitionError
+from availability_service import availability_service, SlotConflictError
+from pricing_engine import pricing_engine, SERVICE_PACKAGES, SERVICE_AREAS
+from write_behind import write_behind
+from recurring_bookings import recurring_booking_service
+from booking_holds import booking_hold_sweeper
+from pagination import paginate, parse_status_filter, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 # Configure logging with more details for production
 logging.basicConfig(
@@ -25,26 +43,76 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Import Stripe integration with error handling
-try:
-    from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
-    STRIPE_AVAILABLE = True
-    logger.info("Stripe integration loaded successfully")
-except ImportError as e:
-    logger.warning(f"Stripe integration not available: {e}")
-    STRIPE_AVAILABLE = False
-    # Create mock classes for development
-    class StripeCheckout:
-        def __init__(self, *args, **kwargs):
-            pass
-    class CheckoutSessionResponse:
-        pass
-    class CheckoutStatusResponse:
-        pass
-    class CheckoutSessionRequest:
-        pass
+async def bootstrap_database():
+    """Connect to MongoDB, then ensure indexes and sample data in the background"""
+    await database.connect(retry_forever=True)
+    logger.info(f"Database connected: {database.connected}")
+    await health_monitor.probe()
+    
+    if database.connected:
+        try:
+            await index_registry.apply()
+        except RequiredIndexError as e:
+            # Without these (e.g. the availability index) bookings could double up,
+            # so keep refusing database traffic rather than serve it unsafely
+            logger.critical(f"Startup aborted: {e}")
+            database.connected = False
+            health_monitor.database_error = str(e)
+            await health_monitor.probe()
+            return
+        
+        try:
+            init_result = await init_sample_cleaners()
+            if init_result:
+                logger.info("Sample cleaners initialized successfully")
+            else:
+                logger.warning("Sample cleaners initialization skipped or failed")
+        except Exception as e:
+            logger.error(f"Error during startup initialization: {e}")
+            # Don't crash the app, just log the error
+        
+        cleaner_cache.start()
+        webhook_ledger.start()
+        recurring_booking_service.start()
+        booking_hold_sweeper.start()
+        write_behind.start()
+    else:
+        logger.warning("Skipping sample data initialization - database not connected")
 
-app = FastAPI(title="Tati's Cleaners API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving immediately and bring the database up in the background"""
+    logger.info("Starting Tati's Cleaners API...")
+    logger.info(f"Stripe available: {STRIPE_AVAILABLE}")
+    
+    database.open()
+    bootstrap_task = asyncio.create_task(bootstrap_database())
+    health_monitor.start()
+    logger.info("Tati's Cleaners API startup completed")
+    
+    yield
+    
+    # Graceful shutdown
+    logger.info("Shutting down Tati's Cleaners API...")
+    bootstrap_task.cancel()
+    await health_monitor.stop()
+    await cleaner_cache.stop()
+    await webhook_ledger.stop()
+    await recurring_booking_service.stop()
+    await booking_hold_sweeper.stop()
+    await write_behind.stop()
+    stripe_client.close()
+    auth_handler.close()
+    await document_image_pipeline.stop()
+    file_upload_service.close()
+    if database.client:
+        try:
+            database.close()
+            logger.info("Database connection closed")
+        except Exception as e:
+            logger.error(f"Error closing database connection: {e}")
+
+app = FastAPI(title="Tati's Cleaners API", version="1.0.0", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -56,124 +124,13 @@ app.add_middleware(
 )
 
 # Database configuration with environment-specific settings
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-DB_NAME = os.getenv("DB_NAME", "tatiscleaners_production")
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY", "")
 
-# Environment detection
-ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
-IS_PRODUCTION = ENVIRONMENT.lower() in ["production", "prod", "staging"]
-
 logger.info(f"Starting application in {ENVIRONMENT} environment")
 logger.info(f"Database name: {DB_NAME}")
 logger.info(f"Production mode: {IS_PRODUCTION}")
 logger.info(f"MongoDB URL configured: {'***ATLAS***' if 'mongodb+srv' in MONGO_URL else 'localhost'}")
 
-# MongoDB connection with improved error handling
-
-# Global variables for database connections
-client = None
-db = None
-cleaners_collection = None
-bookings_collection = None
-payment_transactions_collection = None
-users_collection = None
-cleaner_applications_collection = None
-ratings_collection = None
-
-def init_database():
-    """Initialize database connection with retry logic and Atlas optimization"""
-    global client, db, cleaners_collection, bookings_collection, payment_transactions_collection
-    global users_collection, cleaner_applications_collection, ratings_collection
-    
-    max_retries = 5 if not IS_PRODUCTION else 10  # More retries in production
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            logger.info(f"Attempting to connect to MongoDB (attempt {retry_count + 1}/{max_retries})")
-            
-            # Atlas-optimized connection settings
-            client_options = {
-                'serverSelectionTimeoutMS': 30000,  # 30 second timeout for Atlas
-                'connectTimeoutMS': 30000,
-                'socketTimeoutMS': 30000,
-                'maxPoolSize': 50,
-                'minPoolSize': 5,
-                'retryWrites': True,
-                'retryReads': True,
-                'w': 'majority',
-                'readPreference': 'primary'
-            }
-            
-            # Additional Atlas-specific settings for production
-            if IS_PRODUCTION and 'mongodb+srv' in MONGO_URL:
-                client_options.update({
-                    'ssl': True,
-                    'tlsAllowInvalidCertificates': False,
-                    'authSource': 'admin',
-                    'compressors': 'snappy,zlib,zstd'
-                })
-                logger.info("Using Atlas-optimized connection settings")
-            
-            client = MongoClient(MONGO_URL, **client_options)
-            
-            # Test the connection with timeout
-            client.admin.command('ping')
-            logger.info("✅ MongoDB connection successful")
-            
-            # Initialize database and collections
-            db = client[DB_NAME]
-            cleaners_collection = db.cleaners
-            bookings_collection = db.bookings
-            payment_transactions_collection = db.payment_transactions
-            users_collection = db.users
-            cleaner_applications_collection = db.cleaner_applications
-            ratings_collection = db.ratings
-            
-            logger.info(f"Database '{DB_NAME}' initialized successfully")
-            
-            # Create indexes for production performance
-            if IS_PRODUCTION:
-                try:
-                    logger.info("Creating database indexes for production...")
-                    users_collection.create_index("email", unique=True)
-                    users_collection.create_index("role")
-                    bookings_collection.create_index("customer_email")
-                    bookings_collection.create_index("cleaner_id")
-                    bookings_collection.create_index("status")
-                    bookings_collection.create_index("created_at")
-                    cleaner_applications_collection.create_index("user_id")
-                    cleaner_applications_collection.create_index("status")
-                    ratings_collection.create_index("cleaner_id")
-                    ratings_collection.create_index("booking_id")
-                    logger.info("Database indexes created successfully")
-                except Exception as e:
-                    logger.warning(f"Index creation failed (may already exist): {e}")
-            
-            return True
-            
-        except (ServerSelectionTimeoutError, ConnectionFailure) as e:
-            retry_count += 1
-            logger.error(f"MongoDB connection failed (attempt {retry_count}/{max_retries}): {e}")
-            
-            if retry_count >= max_retries:
-                logger.error("Failed to connect to MongoDB after maximum retries")
-                return False
-            
-            # Wait before retry
-            import time
-            time.sleep(2)
-            
-        except Exception as e:
-            logger.error(f"Unexpected database error: {e}")
-            return False
-    
-    return False
-
-# Initialize database connection
-database_connected = init_database()
-
 # Stripe setup
 STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY')
 if STRIPE_API_KEY:
@@ -204,49 +161,47 @@ class BookingRequest(BaseModel):
     customer_phone: str
     special_instructions: Optional[str] = ""
 
+class RecurringBookingRequest(BaseModel):
+    service_type: str
+    cleaner_id: str
+    start_date: str
+    end_date: Optional[str] = None
+    recurrence: str = "weekly"
+    time: str
+    hours: int
+    location: str
+    address: str
+    special_instructions: Optional[str] = ""
+
 class PaymentRequest(BaseModel):
     booking_id: str
     origin_url: str
 
-# Service packages with updated pricing per cleaner
-SERVICE_PACKAGES = {
-    "regular_cleaning": {
-        "name": "Regular Cleaning",
-        "description": "Standard house cleaning service",
-        "base_price": 40.0  # per hour
-    },
-    "deep_cleaning": {
-        "name": "Deep Cleaning", 
-        "description": "Thorough deep cleaning service",
-        "base_price": 45.0  # per hour
-    },
-    "move_in_out": {
-        "name": "Move In/Out Cleaning",
-        "description": "Complete cleaning for moving",
-        "base_price": 70.0  # per hour
-    },
-    "janitorial_cleaning": {
-        "name": "Janitorial Cleaning",
-        "description": "Commercial janitorial services", 
-        "base_price": 70.0  # per hour
-    }
-}
+class QuoteItem(BaseModel):
+    service_type: str
+    location: str
+    date: str
+    hours: int = Field(..., gt=0)
+    time: Optional[str] = None
+    recurrence: str = "once"
 
-# Service areas
-SERVICE_AREAS = [
-    "Tempe", "Chandler", "Gilbert", "Mesa", 
-    "Phoenix", "Glendale", "Scottsdale", "Avondale"
-]
+class QuoteRequest(BaseModel):
+    items: List[QuoteItem] = Field(..., min_length=1, max_length=1000)
+
+class BookingBulkTransition(BaseModel):
+    booking_ids: List[str] = Field(..., min_length=1, max_length=1000)
+    status: str
+    from_statuses: Optional[List[str]] = None
 
 # Initialize sample cleaners with error handling
-def init_sample_cleaners():
+async def init_sample_cleaners():
     """Initialize sample cleaners data - only in development"""
-    if not database_connected:
+    if not database.connected:
         logger.warning("Database not connected, skipping cleaner initialization")
         return False
     
     try:
-        existing_cleaners = cleaners_collection.count_documents({})
+        existing_cleaners = await database.cleaners.count_documents({})
         if existing_cleaners > 0:
             logger.info(f"Found {existing_cleaners} existing cleaners, skipping initialization")
             return True
@@ -292,7 +247,7 @@ def init_sample_cleaners():
                     "available": True
                 }
             ]
-            cleaners_collection.insert_many(sample_cleaners)
+            await database.cleaners.insert_many(sample_cleaners)
             logger.info(f"Initialized {len(sample_cleaners)} sample cleaners")
         else:
             logger.info("Production environment - skipping sample data initialization")
@@ -310,77 +265,57 @@ async def root():
         "service": "Tati's Cleaners API",
         "status": "healthy",
         "version": "1.0.0",
-        "database_connected": database_connected
+        "database_connected": database.connected
     }
 
 @app.get("/health")
 async def health_check():
-    """Enhanced health check endpoint for deployment monitoring"""
-    try:
-        health_status = {
-            "status": "healthy",
-            "timestamp": datetime.now().isoformat(),
-            "environment": ENVIRONMENT,
-            "database": "disconnected",
-            "database_test": "failed",
-            "stripe": "unavailable",
-            "version": "1.0.0"
-        }
-        
-        # Database connectivity check
-        if database_connected and client:
-            try:
-                # Test database connection
-                client.admin.command('ping')
-                health_status["database"] = "connected"
-                
-                # Test database operations
-                test_result = db.command("buildInfo")
-                if test_result:
-                    health_status["database_test"] = "success"
-                    health_status["mongodb_version"] = test_result.get("version", "unknown")
-                    
-            except Exception as db_error:
-                logger.error(f"Database health check failed: {db_error}")
-                health_status["database"] = "error"
-                health_status["database_error"] = str(db_error)
-        
-        # Stripe availability check
-        if STRIPE_AVAILABLE and STRIPE_API_KEY:
-            health_status["stripe"] = "available"
-        elif STRIPE_API_KEY:
-            health_status["stripe"] = "configured"
-        
-        # Collections status
-        if database_connected:
-            try:
-                health_status["collections"] = {
-                    "cleaners": cleaners_collection.count_documents({}),
-                    "bookings": bookings_collection.count_documents({}),
-                    "users": users_collection.count_documents({}) if users_collection else 0
-                }
-            except Exception:
-                pass
-        
-        return health_status
-        
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return {
-            "status": "unhealthy",
-            "timestamp": datetime.now().isoformat(),
-            "error": str(e)
-        }
+    """Enhanced health check endpoint for deployment monitoring, served from cache"""
+    health_status = {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "environment": ENVIRONMENT,
+        "stripe": "unavailable",
+        "version": "1.0.0",
+        **health_monitor.snapshot(),
+        "file_io": file_upload_service.timings()
+    }
+    
+    # Stripe availability check
+    if STRIPE_AVAILABLE and STRIPE_API_KEY:
+        health_status["stripe"] = "available"
+    elif STRIPE_API_KEY:
+        health_status["stripe"] = "configured"
+    
+    return health_status
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe - the process is up and serving requests"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe - the database is reachable according to the last background probe"""
+    ready = database.connected and health_monitor.database_status != "error"
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "database": health_monitor.database_status if database.connected else "disconnected",
+        "checked_at": health_monitor.checked_at
+    }
+    if not ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 # API Routes with error handling
 @app.get("/api/cleaners")
 async def get_cleaners():
     """Get all available cleaners"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        cleaners = list(cleaners_collection.find({"available": True}, {"_id": 0}))
+        cleaners = await cleaner_cache.available_cleaners()
         return {"cleaners": cleaners}
     except Exception as e:
         logger.error(f"Error fetching cleaners: {e}")
@@ -404,10 +339,87 @@ async def get_services():
         logger.error(f"Error fetching services: {e}")
         raise HTTPException(status_code=500, detail="Error fetching services")
 
+@app.get("/api/cleaners/{cleaner_id}/availability")
+async def get_cleaner_availability(cleaner_id: str, date: str, time: str, hours: int = Query(..., ge=1, le=24)):
+    """Check whether a cleaner is free for a number of hours at a given time"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        cleaner = await cleaner_cache.get_by_id(cleaner_id)
+        if not cleaner:
+            raise HTTPException(status_code=404, detail="Cleaner not found")
+        
+        available = await availability_service.is_free(cleaner, date, time, hours)
+        return {"cleaner_id": cleaner_id, "date": date, "time": time, "hours": hours, "available": available}
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error checking availability: {e}")
+        raise HTTPException(status_code=500, detail="Error checking availability")
+
+@app.post("/api/quotes")
+async def create_quotes(quote_request: QuoteRequest):
+    """Price a batch of line items without creating bookings"""
+    try:
+        quotes = pricing_engine.quote_many([item.model_dump() for item in quote_request.items])
+        priced = [quote["total_amount"] for quote in quotes if "error" not in quote]
+        return {
+            "quotes": quotes,
+            "total_amount": round(sum(priced), 2),
+            "priced_items": len(priced)
+        }
+    except Exception as e:
+        logger.error(f"Error creating quotes: {e}")
+        raise HTTPException(status_code=500, detail="Error creating quotes")
+
+@app.get("/api/availability/search")
+async def search_availability(
+    area: str,
+    service_type: str,
+    start_date: str,
+    end_date: str,
+    hours: int = Query(..., ge=1, le=24)
+):
+    """Find cleaners with free slots in an area over a date range, best rated first"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    if area not in SERVICE_AREAS:
+        raise HTTPException(status_code=400, detail="Service area not supported")
+    
+    if service_type not in SERVICE_PACKAGES:
+        raise HTTPException(status_code=400, detail="Invalid service type")
+    
+    try:
+        # Cleaners without explicit areas or service types serve all of them
+        cleaners = [
+            cleaner for cleaner in await cleaner_cache.available_cleaners()
+            if area in cleaner.get("service_areas", SERVICE_AREAS)
+            and service_type in cleaner.get("service_types", SERVICE_PACKAGES)
+        ]
+        
+        results = await availability_service.search(cleaners, start_date, end_date, hours)
+        return {
+            "area": area,
+            "service_type": service_type,
+            "hours": hours,
+            "cleaners": results
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching availability: {e}")
+        raise HTTPException(status_code=500, detail="Error searching availability")
+
 @app.post("/api/bookings")
 async def create_booking(booking: BookingRequest):
     """Create a new booking"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
@@ -416,7 +428,7 @@ async def create_booking(booking: BookingRequest):
             raise HTTPException(status_code=400, detail="Invalid service type")
         
         # Validate cleaner exists
-        cleaner = cleaners_collection.find_one({"id": booking.cleaner_id})
+        cleaner = await cleaner_cache.get_by_id(booking.cleaner_id)
         if not cleaner:
             raise HTTPException(status_code=400, detail="Cleaner not found")
         
@@ -424,9 +436,22 @@ async def create_booking(booking: BookingRequest):
         if booking.location not in SERVICE_AREAS:
             raise HTTPException(status_code=400, detail="Service area not supported")
         
-        # Calculate total amount
-        service_price = SERVICE_PACKAGES[booking.service_type]["base_price"]
-        total_amount = service_price * booking.hours
+        try:
+            # Calculate total amount
+            total_amount = pricing_engine.quote(
+                booking.service_type,
+                booking.location,
+                booking.date,
+                booking.hours,
+                time=booking.time
+            )["total_amount"]
+            
+            # Claim the cleaner's time slots before the booking exists
+            slot_mask = await availability_service.reserve(cleaner, booking.date, booking.time, booking.hours)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except SlotConflictError as e:
+            raise HTTPException(status_code=409, detail=str(e))
         
         # Create booking
         booking_id = str(uuid.uuid4())
@@ -447,10 +472,17 @@ async def create_booking(booking: BookingRequest):
             "total_amount": total_amount,
             "status": "pending_payment",
             "created_at": datetime.now().isoformat(),
-            "payment_status": "pending"
+            "payment_status": "pending",
+            "slot_mask": slot_mask,
+            # Unpaid bookings give their slots back once this passes
+            "hold_until": booking_hold_sweeper.hold_until()
         }
         
-        bookings_collection.insert_one(booking_data)
+        try:
+            await database.bookings.insert_one(booking_data)
+        except Exception:
+            await availability_service.release(cleaner["id"], booking.date, slot_mask)
+            raise
         
         return {
             "booking_id": booking_id,
@@ -464,10 +496,88 @@ async def create_booking(booking: BookingRequest):
         logger.error(f"Error creating booking: {e}")
         raise HTTPException(status_code=500, detail="Error creating booking")
 
+@app.post("/api/recurring-bookings")
+async def create_recurring_booking(
+    request: RecurringBookingRequest,
+    current_user: dict = Depends(require_customer)
+):
+    """Create a recurring booking and its bookings over the rolling horizon"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        cleaner = await cleaner_cache.get_by_id(request.cleaner_id)
+        if not cleaner:
+            raise HTTPException(status_code=400, detail="Cleaner not found")
+        
+        # The bookings belong to the signed-in customer, never to whoever the body names
+        user = await database.users.find_one(
+            {"id": current_user["user_id"]},
+            {"_id": 0, "first_name": 1, "last_name": 1, "email": 1, "phone": 1}
+        )
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        customer = {
+            "user_id": current_user["user_id"],
+            "name": f"{user['first_name']} {user['last_name']}",
+            "email": user["email"],
+            "phone": user.get("phone") or ""
+        }
+        
+        try:
+            result = await recurring_booking_service.create_contract(
+                request.model_dump(), cleaner, customer
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {
+            **result,
+            "message": f"Recurring booking created with {len(result['booking_ids'])} bookings"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating recurring booking: {e}")
+        raise HTTPException(status_code=500, detail="Error creating recurring booking")
+
+@app.post("/api/recurring-bookings/{contract_id}/cancel")
+async def cancel_recurring_booking(
+    contract_id: str,
+    current_user: dict = Depends(require_customer)
+):
+    """Stop a recurring booking and cancel its upcoming bookings"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        contract = await database.recurring_bookings.find_one({"id": contract_id}, {"_id": 0, "created_by": 1, "status": 1})
+        if not contract:
+            raise HTTPException(status_code=404, detail="Recurring booking not found")
+        if contract["created_by"] != current_user["user_id"] and current_user["role"] != UserRole.ADMIN.value:
+            raise HTTPException(status_code=403, detail="Access denied")
+        if contract["status"] != "active":
+            raise HTTPException(status_code=400, detail="Recurring booking is not active")
+        
+        result = await recurring_booking_service.cancel_contract(contract_id)
+        return {
+            "message": "Recurring booking cancelled",
+            "cancelled_bookings": result["cancelled"],
+            # Already paid for, so left in place to be kept or refunded
+            "paid_bookings": result["paid_booking_ids"]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error cancelling recurring booking: {e}")
+        raise HTTPException(status_code=500, detail="Error cancelling recurring booking")
+
 @app.post("/api/checkout/session")
 async def create_checkout_session(payment: PaymentRequest, request: Request):
     """Create Stripe checkout session for booking payment"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     if not STRIPE_AVAILABLE:
@@ -475,7 +585,7 @@ async def create_checkout_session(payment: PaymentRequest, request: Request):
     
     try:
         # Get booking details
-        booking = bookings_collection.find_one({"id": payment.booking_id})
+        booking = await database.bookings.find_one({"id": payment.booking_id})
         if not booking:
             raise HTTPException(status_code=404, detail="Booking not found")
         
@@ -486,9 +596,14 @@ async def create_checkout_session(payment: PaymentRequest, request: Request):
         if not STRIPE_API_KEY:
             raise HTTPException(status_code=500, detail="Stripe API key not configured")
         
+        # Hold the slots for the session's lifetime before it exists, so the
+        # sweeper cannot cancel the booking while the customer is paying
+        if booking["status"] != "pending_payment" or not await booking_hold_sweeper.extend_for_checkout(payment.booking_id):
+            raise HTTPException(status_code=409, detail="Booking is no longer awaiting payment")
+        
         host_url = payment.origin_url
         webhook_url = f"{host_url}/api/webhook/stripe"
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url=webhook_url)
+        stripe_checkout = stripe_client.get_checkout(webhook_url)
         
         # Create checkout session
         success_url = f"{host_url}?session_id={{CHECKOUT_SESSION_ID}}&booking_id={payment.booking_id}"
@@ -506,7 +621,7 @@ async def create_checkout_session(payment: PaymentRequest, request: Request):
             }
         )
         
-        session = await stripe_checkout.create_checkout_session(checkout_request)
+        session = await stripe_client.call(stripe_checkout.create_checkout_session(checkout_request))
         
         # Create payment transaction record
         payment_transaction = {
@@ -522,7 +637,7 @@ async def create_checkout_session(payment: PaymentRequest, request: Request):
             "metadata": checkout_request.metadata
         }
         
-        payment_transactions_collection.insert_one(payment_transaction)
+        await database.payment_transactions.insert_one(payment_transaction)
         
         return {
             "url": session.url,
@@ -531,67 +646,86 @@ async def create_checkout_session(payment: PaymentRequest, request: Request):
         
     except HTTPException:
         raise
+    except asyncio.TimeoutError:
+        logger.error("Timed out creating checkout session")
+        raise HTTPException(status_code=504, detail="Payment service timed out")
     except Exception as e:
         logger.error(f"Error creating checkout session: {e}")
         raise HTTPException(status_code=500, detail="Error creating checkout session")
 
+async def fetch_checkout_status(session_id: str) -> dict:
+    """Resolve a checkout status, answering terminal states from MongoDB without calling Stripe"""
+    # Get payment transaction
+    transaction = await database.payment_transactions.find_one({"session_id": session_id})
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Payment session not found")
+    
+    known_status = {
+        "status": transaction.get("status"),
+        "payment_status": transaction.get("payment_status"),
+        "amount_total": transaction.get("amount_total", int(round(float(transaction.get("amount", 0)) * 100))),
+        "currency": transaction.get("currency"),
+        "booking_id": transaction["booking_id"]
+    }
+    if is_terminal(known_status):
+        return known_status
+    
+    # Initialize Stripe checkout
+    if not STRIPE_API_KEY:
+        raise HTTPException(status_code=500, detail="Stripe API key not configured")
+    
+    stripe_checkout = stripe_client.get_checkout()
+    
+    # Get status from Stripe  
+    checkout_status = await stripe_client.call(stripe_checkout.get_checkout_status(session_id))
+    
+    # Update transaction status
+    update_data = {
+        "status": checkout_status.status,
+        "payment_status": checkout_status.payment_status,
+        "amount_total": checkout_status.amount_total,
+        "updated_at": datetime.now().isoformat()
+    }
+    
+    await database.payment_transactions.update_one(
+        {"session_id": session_id},
+        {"$set": update_data}
+    )
+    
+    # Update booking status if payment successful
+    if checkout_status.payment_status == "paid" and transaction["payment_status"] != "paid":
+        # A no-op if the webhook confirmed it first; flagged for refund if the hold had lapsed
+        await booking_hold_sweeper.confirm_payments([transaction["booking_id"]], datetime.now().isoformat())
+    elif checkout_status.status == "expired":
+        # The customer can no longer pay this session; stop holding the slots unless a newer one is open
+        await booking_hold_sweeper.expire_checkouts([transaction["booking_id"]])
+    
+    return {
+        "status": checkout_status.status,
+        "payment_status": checkout_status.payment_status,
+        "amount_total": checkout_status.amount_total,
+        "currency": checkout_status.currency,
+        "booking_id": transaction["booking_id"]
+    }
+
 @app.get("/api/checkout/status/{session_id}")
 async def get_checkout_status(session_id: str):
     """Get payment status for a checkout session"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     if not STRIPE_AVAILABLE:
         raise HTTPException(status_code=503, detail="Payment service not available")
     
     try:
-        # Get payment transaction
-        transaction = payment_transactions_collection.find_one({"session_id": session_id})
-        if not transaction:
-            raise HTTPException(status_code=404, detail="Payment session not found")
-        
-        # Initialize Stripe checkout
-        if not STRIPE_API_KEY:
-            raise HTTPException(status_code=500, detail="Stripe API key not configured")
-        
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url="")
-        
-        # Get status from Stripe  
-        checkout_status = await stripe_checkout.get_checkout_status(session_id)
-        
-        # Update transaction status
-        update_data = {
-            "status": checkout_status.status,
-            "payment_status": checkout_status.payment_status,
-            "updated_at": datetime.now().isoformat()
-        }
-        
-        payment_transactions_collection.update_one(
-            {"session_id": session_id},
-            {"$set": update_data}
-        )
-        
-        # Update booking status if payment successful
-        if checkout_status.payment_status == "paid" and transaction["payment_status"] != "paid":
-            bookings_collection.update_one(
-                {"id": transaction["booking_id"]},
-                {"$set": {
-                    "payment_status": "paid",
-                    "status": "confirmed",
-                    "confirmed_at": datetime.now().isoformat()
-                }}
-            )
-        
-        return {
-            "status": checkout_status.status,
-            "payment_status": checkout_status.payment_status,
-            "amount_total": checkout_status.amount_total,
-            "currency": checkout_status.currency,
-            "booking_id": transaction["booking_id"]
-        }
+        # Concurrent polls for one session share a single lookup
+        return await checkout_status_cache.get(session_id, lambda: fetch_checkout_status(session_id))
         
     except HTTPException:
         raise
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out checking payment status for {session_id}")
+        raise HTTPException(status_code=504, detail="Payment service timed out")
     except Exception as e:
         logger.error(f"Error checking payment status: {e}")
         raise HTTPException(status_code=500, detail="Error checking payment status")
@@ -599,7 +733,7 @@ async def get_checkout_status(session_id: str):
 @app.post("/api/webhook/stripe")
 async def stripe_webhook(request: Request):
     """Handle Stripe webhooks"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     if not STRIPE_AVAILABLE:
@@ -612,31 +746,11 @@ async def stripe_webhook(request: Request):
         if not STRIPE_API_KEY:
             raise HTTPException(status_code=500, detail="Stripe API key not configured")
         
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url="")
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        # Process webhook event
-        if webhook_response.event_type == "checkout.session.completed":
-            # Update payment transaction
-            payment_transactions_collection.update_one(
-                {"session_id": webhook_response.session_id},
-                {"$set": {
-                    "payment_status": webhook_response.payment_status,
-                    "webhook_processed_at": datetime.now().isoformat()
-                }}
-            )
-            
-            # Update booking status
-            transaction = payment_transactions_collection.find_one({"session_id": webhook_response.session_id})
-            if transaction:
-                bookings_collection.update_one(
-                    {"id": transaction["booking_id"]},
-                    {"$set": {
-                        "payment_status": "paid",
-                        "status": "confirmed",
-                        "confirmed_at": datetime.now().isoformat()
-                    }}
-                )
+        stripe_checkout = stripe_client.get_checkout()
+        webhook_response = await stripe_client.call(stripe_checkout.handle_webhook(body, signature))
+        
+        # Record the verified event and acknowledge; the ledger consumer applies it
+        await webhook_ledger.record(webhook_response, body)
         
         return {"status": "success"}
         
@@ -649,11 +763,11 @@ async def stripe_webhook(request: Request):
 @app.get("/api/bookings/{booking_id}")
 async def get_booking(booking_id: str):
     """Get booking details"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        booking = bookings_collection.find_one({"id": booking_id}, {"_id": 0})
+        booking = await database.bookings.find_one({"id": booking_id}, {"_id": 0})
         if not booking:
             raise HTTPException(status_code=404, detail="Booking not found")
         return booking
@@ -668,18 +782,18 @@ async def get_booking(booking_id: str):
 @app.post("/api/auth/register", response_model=TokenResponse)
 async def register_user(user_data: UserRegistration):
     """Register a new user"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Check if user already exists
-        existing_user = users_collection.find_one({"email": user_data.email})
+        existing_user = await database.users.find_one({"email": user_data.email})
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Create new user
         user_id = str(uuid.uuid4())
-        hashed_password = auth_handler.encode_password(user_data.password)
+        hashed_password = await auth_handler.encode_password(user_data.password)
         
         user_document = {
             "id": user_id,
@@ -694,7 +808,7 @@ async def register_user(user_data: UserRegistration):
             "updated_at": datetime.utcnow()
         }
         
-        users_collection.insert_one(user_document)
+        await database.users.insert_one(user_document)
         
         # Generate token
         token = auth_handler.encode_token(user_id, user_data.email, user_data.role.value)
@@ -725,28 +839,36 @@ async def register_user(user_data: UserRegistration):
 @app.post("/api/auth/login", response_model=TokenResponse)
 async def login_user(login_data: UserLogin):
     """Login user"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Find user
-        user = users_collection.find_one({"email": login_data.email})
+        user = await database.users.find_one({"email": login_data.email})
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Verify password
-        if not auth_handler.verify_password(login_data.password, user["password"]):
+        if not await auth_handler.verify_password(login_data.password, user["password"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
+        # Upgrade hashes made with an older cost while we have the plaintext
+        if auth_handler.needs_rehash(user["password"]):
+            try:
+                rehashed_password = await auth_handler.encode_password(login_data.password)
+                await database.users.update_one(
+                    {"id": user["id"], "password": user["password"]},
+                    {"$set": {"password": rehashed_password}}
+                )
+            except Exception as e:
+                logger.warning(f"Password rehash skipped for {user['id']}: {e}")
+        
         # Check if user is active
         if not user.get("is_active", True):
             raise HTTPException(status_code=401, detail="Account is deactivated")
         
-        # Update last login
-        users_collection.update_one(
-            {"id": user["id"]},
-            {"$set": {"last_login": datetime.utcnow()}}
-        )
+        # Update last login off the critical path
+        write_behind.defer("users", user["id"], {"last_login": datetime.utcnow()})
         
         # Generate token
         token = auth_handler.encode_token(user["id"], user["email"], user["role"])
@@ -777,11 +899,11 @@ async def login_user(login_data: UserLogin):
 @app.get("/api/auth/me", response_model=UserResponse)
 async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """Get current user information"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        user = users_collection.find_one({"id": current_user["user_id"]})
+        user = await database.users.find_one({"id": current_user["user_id"]})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -810,12 +932,12 @@ async def submit_cleaner_application(
     current_user: dict = Depends(require_customer)
 ):
     """Submit cleaner application"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Check if user already has an application
-        existing_app = cleaner_applications_collection.find_one({"user_id": current_user["user_id"]})
+        existing_app = await database.cleaner_applications.find_one({"user_id": current_user["user_id"]})
         if existing_app:
             raise HTTPException(status_code=400, detail="Application already exists")
         
@@ -847,7 +969,7 @@ async def submit_cleaner_application(
             "updated_at": datetime.utcnow()
         }
         
-        cleaner_applications_collection.insert_one(app_data)
+        await database.cleaner_applications.insert_one(app_data)
         
         return {
             "message": "Application submitted successfully",
@@ -862,18 +984,44 @@ async def submit_cleaner_application(
         logger.error(f"Application submission error: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit application")
 
+async def record_uploaded_document(application: dict, document_type: DocumentType, file_info: dict) -> str:
+    """Attach a stored document to an application, returning the application's status"""
+    update_data = {
+        f"documents.{document_type.value}": file_info,
+        "updated_at": datetime.utcnow()
+    }
+    
+    # Check if all required documents are uploaded
+    required_docs = [DocumentType.ID_FRONT, DocumentType.ID_BACK, DocumentType.SSN_CARD]
+    current_docs = application.get("documents", {})
+    current_docs[document_type.value] = file_info
+    
+    all_required_uploaded = all(doc.value in current_docs for doc in required_docs)
+    
+    if all_required_uploaded and application["status"] == CleanerStatus.DOCUMENTS_REQUIRED.value:
+        update_data["status"] = CleanerStatus.DOCUMENTS_SUBMITTED.value
+    
+    await database.cleaner_applications.update_one(
+        {"application_id": application["application_id"]},
+        {"$set": update_data}
+    )
+    
+    # Review-sized copies and thumbnails are rendered in the background
+    document_image_pipeline.schedule(application["application_id"], document_type.value, file_info)
+    return update_data.get("status", application["status"])
+
 @app.post("/api/cleaner/upload-document")
 async def upload_document(
     document: DocumentUpload,
     current_user: dict = Depends(require_customer)
 ):
     """Upload document for cleaner application"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Verify application ownership
-        application = cleaner_applications_collection.find_one({
+        application = await database.cleaner_applications.find_one({
             "application_id": document.application_id,
             "user_id": current_user["user_id"]
         })
@@ -890,50 +1038,223 @@ async def upload_document(
         )
         
         # Update application with document info
-        update_data = {
-            f"documents.{document.document_type.value}": file_info,
-            "updated_at": datetime.utcnow()
+        application_status = await record_uploaded_document(application, document.document_type, file_info)
+        
+        return {
+            "message": "Document uploaded successfully",
+            "document_type": document.document_type.value,
+            "status": application_status
         }
         
-        # Check if all required documents are uploaded
-        required_docs = [DocumentType.ID_FRONT, DocumentType.ID_BACK, DocumentType.SSN_CARD]
-        current_docs = application.get("documents", {})
-        current_docs[document.document_type.value] = file_info
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Document upload error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to upload document")
+
+@app.post("/api/cleaner/upload-document/stream")
+async def upload_document_stream(
+    request: Request,
+    application_id: str = Query(...),
+    document_type: DocumentType = Query(...),
+    file_name: str = Query(...),
+    current_user: dict = Depends(require_customer)
+):
+    """Upload a document as the raw request body, written to disk as it arrives"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        # Refuse oversized uploads before reading any of the body
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > file_upload_service.max_document_size:
+            raise HTTPException(status_code=413, detail="Document is too large")
         
-        all_required_uploaded = all(doc.value in current_docs for doc in required_docs)
+        # Verify application ownership
+        application = await database.cleaner_applications.find_one({
+            "application_id": application_id,
+            "user_id": current_user["user_id"]
+        })
+        
+        if not application:
+            raise HTTPException(status_code=404, detail="Application not found")
         
-        if all_required_uploaded and application["status"] == CleanerStatus.DOCUMENTS_REQUIRED.value:
-            update_data["status"] = CleanerStatus.DOCUMENTS_SUBMITTED.value
+        try:
+            file_info = await file_upload_service.save_document_stream(
+                request.stream(),
+                file_name,
+                application_id,
+                document_type.value
+            )
+        except DocumentTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
-        cleaner_applications_collection.update_one(
-            {"application_id": document.application_id},
-            {"$set": update_data}
-        )
+        application_status = await record_uploaded_document(application, document_type, file_info)
         
         return {
             "message": "Document uploaded successfully",
-            "document_type": document.document_type.value,
-            "status": update_data.get("status", application["status"])
+            "document_type": document_type.value,
+            "file_size": file_info["file_size"],
+            "sha256": file_info["sha256"],
+            "status": application_status
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Document upload error: {e}")
+        logger.error(f"Streaming document upload error: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload document")
 
+@app.post("/api/cleaner/uploads")
+async def initiate_resumable_upload(
+    upload_request: ResumableUploadRequest,
+    current_user: dict = Depends(require_customer)
+):
+    """Start a resumable document upload"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        # Verify application ownership
+        application = await database.cleaner_applications.find_one(
+            {"application_id": upload_request.application_id, "user_id": current_user["user_id"]},
+            {"_id": 0, "application_id": 1}
+        )
+        
+        if not application:
+            raise HTTPException(status_code=404, detail="Application not found")
+        
+        try:
+            upload = await file_upload_service.create_upload(
+                upload_request.application_id,
+                current_user["user_id"],
+                upload_request.document_type.value,
+                upload_request.file_name,
+                upload_request.total_size
+            )
+        except DocumentTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        return {
+            "upload_id": upload["upload_id"],
+            "received": upload["received"],
+            "total_size": upload["total_size"],
+            "expires_at": upload["expires_at"].isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Resumable upload initiation error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to start upload")
+
+@app.put("/api/cleaner/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    current_user: dict = Depends(require_customer)
+):
+    """Append the raw request body to a resumable upload at offset"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        upload = await file_upload_service.get_upload(upload_id, current_user["user_id"])
+        if not upload:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        
+        try:
+            received = await file_upload_service.write_chunk(upload, offset, request.stream())
+        except UploadOffsetError as e:
+            return JSONResponse(status_code=409, content={"detail": str(e), "received": e.received})
+        except DocumentTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        return {"upload_id": upload_id, "received": received, "total_size": upload["total_size"]}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload chunk error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to store chunk")
+
+@app.get("/api/cleaner/uploads/{upload_id}")
+async def get_upload_progress(
+    upload_id: str,
+    current_user: dict = Depends(require_customer)
+):
+    """How much of a resumable upload has been received"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    upload = await file_upload_service.get_upload(upload_id, current_user["user_id"])
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    
+    return {
+        "upload_id": upload_id,
+        "received": upload["received"],
+        "total_size": upload["total_size"],
+        "complete": upload["received"] == upload["total_size"]
+    }
+
+@app.post("/api/cleaner/uploads/{upload_id}/finalize")
+async def finalize_resumable_upload(
+    upload_id: str,
+    current_user: dict = Depends(require_customer)
+):
+    """Assemble a fully received upload and attach it to its application"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        upload = await file_upload_service.get_upload(upload_id, current_user["user_id"])
+        if not upload:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        
+        application = await database.cleaner_applications.find_one({
+            "application_id": upload["application_id"],
+            "user_id": current_user["user_id"]
+        })
+        if not application:
+            raise HTTPException(status_code=404, detail="Application not found")
+        
+        try:
+            file_info = await file_upload_service.finalize_upload(upload)
+        except UploadOffsetError as e:
+            return JSONResponse(status_code=409, content={"detail": str(e), "received": e.received})
+        
+        document_type = DocumentType(upload["document_type"])
+        application_status = await record_uploaded_document(application, document_type, file_info)
+        await file_upload_service.complete_upload(upload_id)
+        
+        return {
+            "message": "Document uploaded successfully",
+            "document_type": document_type.value,
+            "file_size": file_info["file_size"],
+            "sha256": file_info["sha256"],
+            "status": application_status
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload finalize error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to finalize upload")
+
 @app.post("/api/cleaner/initiate-background-check")
 async def initiate_background_check(
     application_id: str,
     current_user: dict = Depends(require_admin)
 ):
     """Initiate background check for cleaner application (admin only)"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Get application
-        application = cleaner_applications_collection.find_one({"application_id": application_id})
+        application = await database.cleaner_applications.find_one({"application_id": application_id})
         if not application:
             raise HTTPException(status_code=404, detail="Application not found")
         
@@ -947,7 +1268,7 @@ async def initiate_background_check(
         })
         
         # Update application status
-        cleaner_applications_collection.update_one(
+        await database.cleaner_applications.update_one(
             {"application_id": application_id},
             {"$set": {
                 "status": CleanerStatus.BACKGROUND_CHECK.value,
@@ -969,109 +1290,132 @@ async def initiate_background_check(
         logger.error(f"Background check initiation error: {e}")
         raise HTTPException(status_code=500, detail="Failed to initiate background check")
 
+@app.get("/api/admin/cleaner-applications")
+async def list_cleaner_applications(
+    status: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(require_admin)
+):
+    """List cleaner applications newest first (admin only)"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        query = {}
+        status_filter = parse_status_filter(status)
+        if status_filter:
+            query["status"] = status_filter
+        
+        page = await paginate(
+            database.cleaner_applications,
+            query,
+            id_field="application_id",
+            limit=limit,
+            cursor=cursor,
+            projection={"personal_info.ssn": 0}
+        )
+        return {"applications": page["items"], "next_cursor": page["next_cursor"]}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Application listing error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list applications")
+
 # === DASHBOARD ENDPOINTS ===
 
 @app.get("/api/customer/dashboard")
 async def get_customer_dashboard(current_user: dict = Depends(require_customer)):
     """Get customer dashboard data"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
-        # Get user's bookings
-        user_bookings = list(bookings_collection.find(
-            {"customer_email": current_user["email"]},
-            {"_id": 0}
-        ).sort("created_at", -1))
-        
-        # Calculate stats
-        total_bookings = len(user_bookings)
-        completed_bookings = len([b for b in user_bookings if b.get("status") == "completed"])
-        upcoming_bookings = len([b for b in user_bookings if b.get("status") in ["confirmed", "in_progress"]])
-        total_spent = sum(float(b.get("total_amount", 0)) for b in user_bookings if b.get("payment_status") == "paid")
-        
-        # Get favorite cleaners (most booked)
-        cleaner_counts = {}
-        for booking in user_bookings:
-            cleaner_id = booking.get("cleaner_id")
-            if cleaner_id:
-                cleaner_counts[cleaner_id] = cleaner_counts.get(cleaner_id, 0) + 1
-        
-        favorite_cleaners = []
-        for cleaner_id, count in sorted(cleaner_counts.items(), key=lambda x: x[1], reverse=True)[:3]:
-            cleaner = cleaners_collection.find_one({"id": cleaner_id}, {"_id": 0})
-            if cleaner:
-                favorite_cleaners.append({
-                    "cleaner": cleaner,
-                    "booking_count": count
-                })
-        
-        return {
-            "stats": {
-                "total_bookings": total_bookings,
-                "completed_bookings": completed_bookings,
-                "upcoming_bookings": upcoming_bookings,
-                "total_spent": total_spent,
-                "favorite_cleaners": favorite_cleaners
-            },
-            "recent_bookings": user_bookings[:5],
-            "upcoming_bookings": [b for b in user_bookings if b.get("status") in ["confirmed", "in_progress"]][:5]
-        }
+        return await dashboard_service.get_customer_dashboard(current_user["email"])
         
     except Exception as e:
         logger.error(f"Customer dashboard error: {e}")
         raise HTTPException(status_code=500, detail="Failed to load dashboard")
 
+@app.get("/api/customer/bookings")
+async def list_customer_bookings(
+    status: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(require_customer)
+):
+    """List the customer's bookings newest first"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        query = {"customer_email": current_user["email"]}
+        status_filter = parse_status_filter(status)
+        if status_filter:
+            query["status"] = status_filter
+        
+        page = await paginate(database.bookings, query, limit=limit, cursor=cursor)
+        return {"bookings": page["items"], "next_cursor": page["next_cursor"]}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Customer bookings listing error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list bookings")
+
 @app.get("/api/cleaner/dashboard")
 async def get_cleaner_dashboard(current_user: dict = Depends(require_cleaner)):
     """Get cleaner dashboard data"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Find cleaner record
-        cleaner = cleaners_collection.find_one({"email": current_user["email"]})
+        cleaner = await cleaner_cache.get_by_email(current_user["email"])
         if not cleaner:
             raise HTTPException(status_code=404, detail="Cleaner profile not found")
         
-        # Get cleaner's jobs
-        cleaner_jobs = list(bookings_collection.find(
-            {"cleaner_id": cleaner["id"]},
-            {"_id": 0}
-        ).sort("created_at", -1))
-        
-        # Calculate stats
-        total_jobs = len(cleaner_jobs)
-        completed_jobs = len([j for j in cleaner_jobs if j.get("status") == "completed"])
-        upcoming_jobs = len([j for j in cleaner_jobs if j.get("status") in ["confirmed", "in_progress"]])
-        total_earnings = sum(float(j.get("total_amount", 0)) for j in cleaner_jobs if j.get("payment_status") == "paid")
+        return await dashboard_service.get_cleaner_dashboard(cleaner)
         
-        # Get ratings
-        cleaner_ratings = list(ratings_collection.find({"cleaner_id": cleaner["id"]}))
-        average_rating = sum(r["rating"] for r in cleaner_ratings) / len(cleaner_ratings) if cleaner_ratings else 0
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Cleaner dashboard error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load dashboard")
+
+@app.get("/api/cleaner/jobs")
+async def list_cleaner_jobs(
+    status: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(require_cleaner)
+):
+    """List the cleaner's jobs newest first"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        # Find cleaner record
+        cleaner = await cleaner_cache.get_by_email(current_user["email"])
+        if not cleaner:
+            raise HTTPException(status_code=404, detail="Cleaner profile not found")
         
-        # Get pending requests (new bookings)
-        pending_requests = len([j for j in cleaner_jobs if j.get("status") == "pending_acceptance"])
+        query = {"cleaner_id": cleaner["id"]}
+        status_filter = parse_status_filter(status)
+        if status_filter:
+            query["status"] = status_filter
         
-        return {
-            "stats": {
-                "total_jobs": total_jobs,
-                "completed_jobs": completed_jobs,
-                "upcoming_jobs": upcoming_jobs,
-                "total_earnings": total_earnings,
-                "average_rating": round(average_rating, 1),
-                "pending_requests": pending_requests
-            },
-            "recent_jobs": cleaner_jobs[:5],
-            "upcoming_jobs": [j for j in cleaner_jobs if j.get("status") in ["confirmed", "in_progress"]][:5],
-            "pending_jobs": [j for j in cleaner_jobs if j.get("status") == "pending_acceptance"][:5]
-        }
+        page = await paginate(database.bookings, query, limit=limit, cursor=cursor)
+        return {"jobs": page["items"], "next_cursor": page["next_cursor"]}
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Cleaner dashboard error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to load dashboard")
+        logger.error(f"Cleaner jobs listing error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list jobs")
 
 @app.post("/api/bookings/{booking_id}/rate")
 async def rate_booking(
@@ -1080,12 +1424,12 @@ async def rate_booking(
     current_user: dict = Depends(require_customer)
 ):
     """Rate a completed booking"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Verify booking ownership
-        booking = bookings_collection.find_one({
+        booking = await database.bookings.find_one({
             "id": booking_id,
             "customer_email": current_user["email"]
         })
@@ -1097,7 +1441,7 @@ async def rate_booking(
             raise HTTPException(status_code=400, detail="Can only rate completed bookings")
         
         # Check if already rated
-        existing_rating = ratings_collection.find_one({"booking_id": booking_id})
+        existing_rating = await database.ratings.find_one({"booking_id": booking_id})
         if existing_rating:
             raise HTTPException(status_code=400, detail="Booking already rated")
         
@@ -1112,16 +1456,10 @@ async def rate_booking(
             "created_at": datetime.utcnow()
         }
         
-        ratings_collection.insert_one(rating_doc)
+        await database.ratings.insert_one(rating_doc)
         
-        # Update cleaner's average rating
-        cleaner_ratings = list(ratings_collection.find({"cleaner_id": rating_data.cleaner_id}))
-        avg_rating = sum(r["rating"] for r in cleaner_ratings) / len(cleaner_ratings)
-        
-        cleaners_collection.update_one(
-            {"id": rating_data.cleaner_id},
-            {"$set": {"rating": round(avg_rating, 1)}}
-        )
+        # Update cleaner's running rating aggregates
+        await rating_service.record_rating(rating_data.cleaner_id, rating_data.rating)
         
         return {"message": "Rating submitted successfully"}
         
@@ -1138,27 +1476,15 @@ async def accept_booking(
     current_user: dict = Depends(require_cleaner)
 ):
     """Accept or decline a booking"""
-    if not database_connected:
+    if not database.connected:
         raise HTTPException(status_code=503, detail="Database not available")
     
     try:
         # Find cleaner record
-        cleaner = cleaners_collection.find_one({"email": current_user["email"]})
+        cleaner = await cleaner_cache.get_by_email(current_user["email"])
         if not cleaner:
             raise HTTPException(status_code=404, detail="Cleaner profile not found")
         
-        # Verify booking
-        booking = bookings_collection.find_one({
-            "id": booking_id,
-            "cleaner_id": cleaner["id"]
-        })
-        
-        if not booking:
-            raise HTTPException(status_code=404, detail="Booking not found")
-        
-        if booking.get("status") != "pending_acceptance":
-            raise HTTPException(status_code=400, detail="Booking not available for acceptance")
-        
         # Update booking status
         if acceptance.accepted:
             new_status = "confirmed"
@@ -1167,18 +1493,27 @@ async def accept_booking(
             new_status = "declined"
             message = "Booking declined"
         
-        bookings_collection.update_one(
-            {"id": booking_id},
-            {"$set": {
-                "status": new_status,
-                "cleaner_response": {
-                    "accepted": acceptance.accepted,
-                    "reason": acceptance.reason,
-                    "responded_at": datetime.utcnow()
-                },
-                "updated_at": datetime.utcnow()
-            }}
-        )
+        try:
+            await booking_state_machine.transition(
+                booking_id,
+                new_status,
+                from_statuses=["pending_acceptance"],
+                match={"cleaner_id": cleaner["id"]},
+                set_fields={
+                    "cleaner_response": {
+                        "accepted": acceptance.accepted,
+                        "reason": acceptance.reason,
+                        "responded_at": datetime.utcnow()
+                    }
+                }
+            )
+        except BookingTransitionError as e:
+            if e.current_status is None:
+                raise HTTPException(status_code=404, detail="Booking not found")
+            raise HTTPException(status_code=400, detail="Booking not available for acceptance")
+        
+        if not acceptance.accepted:
+            await availability_service.release_bookings([booking_id])
         
         return {"message": message}
         
@@ -1188,42 +1523,82 @@ async def accept_booking(
         logger.error(f"Booking acceptance error: {e}")
         raise HTTPException(status_code=500, detail="Failed to process booking response")
 
-# Keep existing endpoints below...
-
-# Initialize sample data on startup with proper error handling
-@app.on_event("startup")
-async def startup_event():
-    """Initialize application on startup"""
-    logger.info("Starting Tati's Cleaners API...")
-    logger.info(f"Database connected: {database_connected}")
-    logger.info(f"Stripe available: {STRIPE_AVAILABLE}")
+@app.get("/api/admin/cleaner-applications/{application_id}/documents/{document_type}")
+async def get_application_document(
+    application_id: str,
+    document_type: DocumentType,
+    variant: str = Query("thumbnail", pattern="^(thumbnail|review|original)$"),
+    current_user: dict = Depends(require_admin)
+):
+    """Serve an application document for review, preferring a processed variant (admin only)"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
     
-    if database_connected:
-        try:
-            init_result = init_sample_cleaners()
-            if init_result:
-                logger.info("Sample cleaners initialized successfully")
-            else:
-                logger.warning("Sample cleaners initialization skipped or failed")
-        except Exception as e:
-            logger.error(f"Error during startup initialization: {e}")
-            # Don't crash the app, just log the error
-    else:
-        logger.warning("Skipping sample data initialization - database not connected")
+    application = await database.cleaner_applications.find_one(
+        {"application_id": application_id},
+        {"_id": 0, f"documents.{document_type.value}": 1}
+    )
+    file_info = (application or {}).get("documents", {}).get(document_type.value)
+    if not file_info:
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    logger.info("Tati's Cleaners API startup completed")
+    # Fall back to the original until the variants have been rendered
+    variant_info = file_info.get("variants", {}).get(variant) if variant != "original" else None
+    if variant_info:
+        return FileResponse(variant_info["file_path"], media_type=variant_info["content_type"])
+    
+    # The original is what the decision rests on, so make sure it is the bytes that were uploaded
+    # (documents stored before content addressing have no digest to check)
+    if file_info.get("sha256") and not await file_upload_service.verify_document(file_info):
+        logger.error(f"Document failed its integrity check: {application_id} {document_type.value}")
+        raise HTTPException(status_code=500, detail="Stored document failed its integrity check")
+    return FileResponse(file_info["file_path"], filename=file_info.get("original_name"))
 
-# Graceful shutdown
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Clean shutdown of the application"""
-    logger.info("Shutting down Tati's Cleaners API...")
-    if client:
-        try:
-            client.close()
-            logger.info("Database connection closed")
-        except Exception as e:
-            logger.error(f"Error closing database connection: {e}")
+@app.post("/api/admin/documents/gc")
+async def collect_document_garbage(
+    dry_run: bool = Query(False),
+    current_user: dict = Depends(require_admin)
+):
+    """Remove stored documents no application references (admin only)"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        return await file_upload_service.collect_garbage(dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"Document garbage collection error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to collect document garbage")
+
+@app.post("/api/admin/bookings/transition")
+async def bulk_transition_bookings(
+    transition: BookingBulkTransition,
+    current_user: dict = Depends(require_admin)
+):
+    """Move many bookings to a new status at once (admin only)"""
+    if not database.connected:
+        raise HTTPException(status_code=503, detail="Database not available")
+    
+    try:
+        updated = await booking_state_machine.bulk_transition(
+            transition.booking_ids,
+            transition.status,
+            from_statuses=transition.from_statuses
+        )
+        
+        if transition.status in ("cancelled", "declined"):
+            await availability_service.release_bookings(transition.booking_ids)
+        
+        return {
+            "message": f"{updated} bookings moved to {transition.status}",
+            "requested": len(transition.booking_ids),
+            "updated": updated
+        }
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk booking transition error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to transition bookings")
 
 if __name__ == "__main__":
     import uvicorn
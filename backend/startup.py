@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Production startup script for Tati's Cleaners backend
-Handles database initialization and health checks before starting the server
+Checks required configuration before starting the server. The API connects
+to MongoDB in the background and reports readiness itself, so the blocking
+MongoDB probe only runs when requested with --check-db.
 """
 
 import os
@@ -88,8 +90,8 @@ def main():
     if not check_required_env_vars():
         sys.exit(1)
     
-    # Check MongoDB connection
-    if not check_mongodb_connection():
+    # Optionally wait for MongoDB before handing over to the server
+    if "--check-db" in sys.argv[1:] and not check_mongodb_connection():
         sys.exit(1)
     
     logger.info("✅ All startup checks passed - ready to start server")
@@ -0,0 +1,173 @@
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from database import database
+from checkout_status_cache import checkout_status_cache
+from booking_holds import booking_hold_sweeper
+
+logger = logging.getLogger(__name__)
+
+class WebhookLedger:
+    """Durable ledger of Stripe webhook events, applied in batches by a background consumer"""
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+        self.poll_interval = float(os.getenv("WEBHOOK_POLL_INTERVAL_SECONDS", "5"))
+        self.max_attempts = 5
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def record(self, webhook_response, body: bytes) -> bool:
+        """Append a verified event to the ledger; False if it was already delivered"""
+        event_id = getattr(webhook_response, "event_id", None)
+        if not event_id:
+            try:
+                event_id = json.loads(body).get("id")
+            except (ValueError, AttributeError):
+                event_id = None
+
+        event = {
+            "event_id": event_id or str(uuid.uuid4()),
+            "event_type": webhook_response.event_type,
+            "session_id": getattr(webhook_response, "session_id", None),
+            "payment_status": getattr(webhook_response, "payment_status", None),
+            "metadata": getattr(webhook_response, "metadata", None) or {},
+            "state": "pending",
+            "attempts": 0,
+            "received_at": datetime.utcnow()
+        }
+
+        try:
+            await database.webhook_events.insert_one(event)
+        except DuplicateKeyError:
+            logger.info(f"Duplicate webhook delivery ignored: {event['event_id']}")
+            return False
+
+        self._wakeup.set()
+        return True
+
+    async def _apply_checkout_completed(self, events: List[Dict[str, Any]]):
+        """Mark the paid transactions and confirm their bookings"""
+        now = datetime.now().isoformat()
+        session_ids = [event["session_id"] for event in events if event.get("session_id")]
+        if not session_ids:
+            return
+
+        await database.payment_transactions.bulk_write([
+            UpdateOne(
+                {"session_id": event["session_id"]},
+                {"$set": {
+                    "payment_status": event.get("payment_status"),
+                    "webhook_processed_at": now
+                }}
+            )
+            for event in events if event.get("session_id")
+        ], ordered=False)
+
+        transactions = await database.payment_transactions.find(
+            {"session_id": {"$in": session_ids}},
+            {"_id": 0, "booking_id": 1}
+        ).to_list(length=None)
+        booking_ids = [transaction["booking_id"] for transaction in transactions if transaction.get("booking_id")]
+
+        await booking_hold_sweeper.confirm_payments(booking_ids, now)
+
+        for session_id in session_ids:
+            checkout_status_cache.invalidate(session_id)
+
+    async def _apply_checkout_expired(self, events: List[Dict[str, Any]]):
+        """Mark abandoned checkouts expired and release their bookings' slots if nothing else can pay them"""
+        session_ids = [event["session_id"] for event in events if event.get("session_id")]
+        if not session_ids:
+            return
+
+        await database.payment_transactions.update_many(
+            {"session_id": {"$in": session_ids}, "payment_status": {"$ne": "paid"}},
+            {"$set": {"status": "expired", "webhook_processed_at": datetime.now().isoformat()}}
+        )
+
+        transactions = await database.payment_transactions.find(
+            {"session_id": {"$in": session_ids}},
+            {"_id": 0, "booking_id": 1}
+        ).to_list(length=None)
+        await booking_hold_sweeper.expire_checkouts(
+            [transaction["booking_id"] for transaction in transactions if transaction.get("booking_id")]
+        )
+
+        for session_id in session_ids:
+            checkout_status_cache.invalidate(session_id)
+
+    async def process_batch(self) -> int:
+        """Apply one batch of pending events; returns how many were taken"""
+        events = await database.webhook_events.find(
+            {"state": "pending"}
+        ).sort("received_at", 1).limit(self.batch_size).to_list(length=self.batch_size)
+        if not events:
+            return 0
+
+        event_ids = [event["event_id"] for event in events]
+        try:
+            completed = [event for event in events if event["event_type"] == "checkout.session.completed"]
+            await self._apply_checkout_completed(completed)
+            expired = [event for event in events if event["event_type"] == "checkout.session.expired"]
+            await self._apply_checkout_expired(expired)
+
+            await database.webhook_events.update_many(
+                {"event_id": {"$in": event_ids}},
+                {"$set": {"state": "processed", "processed_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logger.error(f"Webhook batch failed: {e}")
+            await database.webhook_events.update_many(
+                {"event_id": {"$in": event_ids}},
+                {"$inc": {"attempts": 1}, "$set": {"last_error": str(e)}}
+            )
+            await database.webhook_events.update_many(
+                {"event_id": {"$in": event_ids}, "attempts": {"$gte": self.max_attempts}},
+                {"$set": {"state": "failed"}}
+            )
+            raise
+
+        return len(events)
+
+    async def _run(self):
+        """Drain pending events whenever woken, and on a slow poll as a safety net"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                while await self.process_batch() == self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook consumer error: {e}")
+
+    def start(self):
+        """Start the background consumer"""
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the consumer; unprocessed events stay pending in the ledger"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+webhook_ledger = WebhookLedger()
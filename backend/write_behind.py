@@ -0,0 +1,91 @@
+import os
+import asyncio
+from typing import Dict, Any, Optional, Tuple
+import logging
+from pymongo import UpdateOne
+from pymongo.write_concern import WriteConcern
+from database import database
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindBuffer:
+    """Coalesce non-critical field updates in memory and flush them in batches"""
+
+    def __init__(self):
+        self.flush_interval = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "5"))
+        self.max_pending = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "1000"))
+        # Losing a few of these on failover is acceptable, so skip the majority wait
+        self.write_concern = WriteConcern(w=1)
+
+        # (collection attribute, document id) -> fields to $set, latest value wins
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def defer(self, collection: str, doc_id: str, fields: Dict[str, Any]):
+        """Queue a $set on the document with this id; never waits on MongoDB"""
+        self._pending.setdefault((collection, doc_id), {}).update(fields)
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write everything queued so far; returns how many documents were updated"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+
+        by_collection: Dict[str, list] = {}
+        for (collection, doc_id), fields in pending.items():
+            by_collection.setdefault(collection, []).append(
+                UpdateOne({"id": doc_id}, {"$set": fields})
+            )
+
+        flushed = 0
+        for collection, operations in by_collection.items():
+            try:
+                target = getattr(database, collection).with_options(write_concern=self.write_concern)
+                await target.bulk_write(operations, ordered=False)
+                flushed += len(operations)
+            except Exception as e:
+                logger.error(f"Write-behind flush to {collection} failed: {e}")
+                # Requeue under anything newer that arrived in the meantime
+                for (pending_collection, doc_id), fields in pending.items():
+                    if pending_collection == collection:
+                        key = (collection, doc_id)
+                        self._pending[key] = {**fields, **self._pending.get(key, {})}
+        return flushed
+
+    async def _run(self):
+        """Flush on an interval, or early once the buffer fills"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind error: {e}")
+
+    def start(self):
+        """Start the background flusher"""
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write out whatever is still buffered"""
+        if self._task:
+            # Let an in-progress flush finish rather than cancelling it mid-batch
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        if database.connected:
+            await self.flush()
+
+# Global instance
+write_behind = WriteBehindBuffer()
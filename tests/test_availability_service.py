@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+from bson.int64 import Int64
+
+from database import database
+from availability_service import (
+    SLOTS_PER_DAY,
+    availability_service,
+    parse_time,
+    span_mask,
+    booking_mask,
+)
+
+
+class StubCursor:
+    def __init__(self, documents):
+        self.documents = list(documents)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class StubAvailability:
+    """Just enough of a Motor collection for AvailabilityService.search"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return StubCursor(self.documents)
+
+
+def booked(cleaner_id, day, *spans):
+    mask = 0
+    for start, end in spans:
+        mask |= span_mask(parse_time(start), parse_time(end))
+    return {"cleaner_id": cleaner_id, "date": day, "booked": Int64(mask)}
+
+
+def search(monkeypatch, cleaners, documents, start_day, end_day, hours):
+    collection = StubAvailability(documents)
+    monkeypatch.setattr(database, "availability", collection)
+    return asyncio.run(availability_service.search(cleaners, start_day, end_day, hours)), collection
+
+
+@pytest.mark.parametrize("value, minutes", [
+    ("00:00", 0),
+    ("14:30", 14 * 60 + 30),
+    ("4:00 PM", 16 * 60),
+    ("4:00pm", 16 * 60),
+    ("12:00 AM", 0),
+    ("12:30 PM", 12 * 60 + 30),
+    ("11:30 PM", 23 * 60 + 30),
+    (" 9:15 ", 9 * 60 + 15),
+])
+def test_parse_time(value, minutes):
+    assert parse_time(value) == minutes
+
+
+@pytest.mark.parametrize("value", ["", None, "noon", "24:00", "12:60", "0:30 AM", "13:00 PM", "9:5", "9:00 XM"])
+def test_parse_time_rejects_bad_input(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
+
+
+def test_span_mask_sets_one_bit_per_slot():
+    assert span_mask(0, 30) == 0b1
+    assert span_mask(60, 120) == 0b1100
+    assert span_mask(0, 24 * 60) == (1 << SLOTS_PER_DAY) - 1
+
+
+def test_span_mask_last_slot_of_day():
+    assert span_mask(23 * 60 + 30, 24 * 60) == 1 << (SLOTS_PER_DAY - 1)
+
+
+@pytest.mark.parametrize("start, end", [
+    (15, 60),  # off the slot grid
+    (60, 75),
+    (60, 60),  # empty
+    (120, 60),  # backwards
+    (23 * 60, 25 * 60),  # past midnight
+])
+def test_span_mask_rejects_bad_spans(start, end):
+    with pytest.raises(ValueError):
+        span_mask(start, end)
+
+
+def test_booking_mask():
+    assert booking_mask("9:00 AM", 2) == span_mask(9 * 60, 11 * 60)
+    assert booking_mask("22:00", 2) == span_mask(22 * 60, 24 * 60)
+
+
+@pytest.mark.parametrize("time, hours", [("23:00", 2), ("09:00", 0), ("09:15", 1)])
+def test_booking_mask_rejects_bad_bookings(time, hours):
+    with pytest.raises(ValueError):
+        booking_mask(time, hours)
+
+
+MONDAY, TUESDAY, SUNDAY = "2024-05-06", "2024-05-07", "2024-05-12"
+
+
+def test_search_finds_runs_of_free_slots(monkeypatch):
+    cleaner = {"id": "c1", "working_hours": {"monday": ["09:00", "13:00"]}}
+    results, collection = search(
+        monkeypatch, [cleaner], [booked("c1", MONDAY, ("10:00", "11:00"))], MONDAY, MONDAY, 1
+    )
+    assert results == [{"cleaner": cleaner, "free_slots": {MONDAY: ["09:00", "11:00", "11:30", "12:00"]}}]
+    assert collection.queries == [{"cleaner_id": {"$in": ["c1"]}, "date": {"$gte": MONDAY, "$lte": MONDAY}}]
+
+
+def test_search_maps_high_slots_to_their_times(monkeypatch):
+    # Slots past the first few bytes of the bitmap must still map to the right clock time
+    cleaner = {"id": "c1", "working_hours": {"monday": ["19:00", "23:30"]}}
+    results, _ = search(
+        monkeypatch, [cleaner], [booked("c1", MONDAY, ("19:30", "22:00"))], MONDAY, MONDAY, 1
+    )
+    assert results[0]["free_slots"] == {MONDAY: ["22:00", "22:30"]}
+
+
+def test_search_run_must_fit_whole_duration(monkeypatch):
+    cleaner = {"id": "c1", "working_hours": {"monday": ["09:00", "12:00"]}}
+    results, _ = search(
+        monkeypatch, [cleaner], [booked("c1", MONDAY, ("10:30", "11:00"))], MONDAY, MONDAY, 2
+    )
+    assert results == []
+
+
+def test_search_spreads_over_days_and_skips_days_off(monkeypatch):
+    cleaner = {"id": "c1", "working_hours": {"monday": ["09:00", "10:00"], "tuesday": ["15:00", "16:00"]}}
+    documents = [
+        booked("c1", TUESDAY, ("15:00", "15:30")),
+        booked("c1", "2024-05-20", ("09:00", "10:00")),  # outside the range
+    ]
+    results, _ = search(monkeypatch, [cleaner], documents, MONDAY, SUNDAY, 1)
+    assert results[0]["free_slots"] == {MONDAY: ["09:00"]}
+
+
+def test_search_orders_cleaners_by_rating(monkeypatch):
+    hours = {"monday": ["09:00", "10:00"]}
+    cleaners = [
+        {"id": "low", "rating": 3.5, "working_hours": hours},
+        {"id": "busy", "rating": 5.0, "working_hours": hours},
+        {"id": "unrated", "working_hours": hours},
+        {"id": "high", "rating": 4.8, "working_hours": hours},
+    ]
+    results, _ = search(monkeypatch, cleaners, [booked("busy", MONDAY, ("09:00", "10:00"))], MONDAY, MONDAY, 1)
+    assert [result["cleaner"]["id"] for result in results] == ["high", "low", "unrated"]
+
+
+@pytest.mark.parametrize("start_day, end_day, hours", [
+    (TUESDAY, MONDAY, 1),
+    (MONDAY, "2024-08-01", 1),
+    (MONDAY, MONDAY, 0),
+    (MONDAY, MONDAY, 25),
+    ("06/05/2024", MONDAY, 1),
+])
+def test_search_rejects_bad_requests(monkeypatch, start_day, end_day, hours):
+    with pytest.raises(ValueError):
+        search(monkeypatch, [{"id": "c1"}], [], start_day, end_day, hours)
+
+
+class IndexlessAvailability(StubAvailability):
+    """A collection whose unique index cannot be built; nothing may be written to it"""
+
+    def __init__(self):
+        super().__init__([])
+        self.writes = 0
+
+    async def create_index(self, keys, **options):
+        raise RuntimeError("index build failed")
+
+    async def update_one(self, query, update, upsert=False):
+        self.writes += 1
+
+
+def test_reserve_refuses_without_the_unique_index(monkeypatch):
+    collection = IndexlessAvailability()
+    monkeypatch.setattr(database, "availability", collection)
+    monkeypatch.setattr(availability_service, "_indexed", False)
+    with pytest.raises(RuntimeError):
+        asyncio.run(availability_service.reserve({"id": "c1"}, MONDAY, "09:00", 2))
+    assert collection.writes == 0
+
+
+def test_cleaner_without_working_hours_is_unrestricted(monkeypatch):
+    # The booking form offers starts up to 4 PM for up to 8 hours
+    results, _ = search(monkeypatch, [{"id": "c1"}], [], MONDAY, MONDAY, 8)
+    assert results[0]["free_slots"][MONDAY][0] == "00:00"
+    assert results[0]["free_slots"][MONDAY][-1] == "16:00"
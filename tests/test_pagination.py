@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import encode_cursor, decode_cursor, parse_status_filter
+
+
+def test_cursor_round_trips_string_created_at():
+    cursor = encode_cursor("2024-05-01T10:00:00", "booking-1")
+    assert decode_cursor(cursor) == {"created_at": "2024-05-01T10:00:00", "id": "booking-1"}
+
+
+def test_cursor_round_trips_datetime_created_at():
+    created_at = datetime(2024, 5, 1, 10, 0, 0, 123456)
+    position = decode_cursor(encode_cursor(created_at, "booking-1"))
+    assert position["created_at"] == created_at
+    assert isinstance(position["created_at"], datetime)
+    assert position["id"] == "booking-1"
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = encode_cursor(datetime(2024, 5, 1), "a" * 37)
+    assert "=" not in cursor
+    assert "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "%%%",
+    "eyJ4IjoxfQ",  # {"x":1}, valid JSON without the sort key
+    "WzEsMl0",  # [1,2]
+    "eyJjIjoiYmFkIiwiZCI6dHJ1ZSwiaSI6ImEifQ",  # {"c":"bad","d":true,"i":"a"}
+])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_parse_status_filter():
+    assert parse_status_filter(None) is None
+    assert parse_status_filter(" , ") is None
+    assert parse_status_filter("confirmed") == "confirmed"
+    assert parse_status_filter("confirmed, completed") == {"$in": ["confirmed", "completed"]}
@@ -0,0 +1,86 @@
+import copy
+
+import pytest
+
+from pricing_engine import DEFAULT_PRICING_RULES, SERVICE_PACKAGES, PricingEngine
+
+
+def make_engine(**overrides):
+    rules = copy.deepcopy(DEFAULT_PRICING_RULES)
+    for key, value in overrides.items():
+        if isinstance(value, dict):
+            rules[key].update(value)
+        else:
+            rules[key] = value
+    return PricingEngine(rules)
+
+
+def item(**fields):
+    return {"service_type": "regular_cleaning", "location": "Tempe", "date": "2024-05-06", "hours": 2, **fields}
+
+
+def test_quote_many_empty_batch():
+    assert make_engine().quote_many([]) == []
+
+
+@pytest.mark.parametrize("date, weekday", [
+    ("2024-05-06", "monday"),
+    ("2024-05-11", "saturday"),
+    ("2024-05-12", "sunday"),
+    ("1970-01-01", "thursday"),
+    ("1969-12-29", "monday"),  # before the epoch the day number is negative
+])
+def test_quote_many_applies_weekday_modifier(date, weekday):
+    engine = make_engine(weekday_modifiers={weekday: 1.5})
+    quote = engine.quote_many([item(date=date)])[0]
+    assert quote["time_modifier"] == 1.5
+    assert quote["total_amount"] == SERVICE_PACKAGES["regular_cleaning"]["base_price"] * 2 * 1.5
+
+
+def test_quote_many_combines_modifiers():
+    engine = make_engine(
+        area_modifiers={"Scottsdale": 1.2},
+        weekday_modifiers={"saturday": 1.25},
+        evening_modifier=1.1,
+        recurrence_discounts={"weekly": 0.1}
+    )
+    quote = engine.quote_many([item(
+        service_type="deep_cleaning", location="Scottsdale", date="2024-05-11", hours=3,
+        time="6:30 PM", recurrence="weekly"
+    )])[0]
+    assert quote["unit_price"] == 45.0
+    assert quote["area_modifier"] == 1.2
+    assert quote["time_modifier"] == pytest.approx(1.25 * 1.1)
+    assert quote["discount"] == 0.1
+    assert quote["total_amount"] == round(45.0 * 3 * 1.2 * 1.25 * 1.1 * 0.9, 2)
+
+
+def test_quote_many_evening_starts_at_rule():
+    engine = make_engine(evening_modifier=2.0)
+    before, at = engine.quote_many([item(time="17:30"), item(time="18:00")])
+    assert before["time_modifier"] == 1.0
+    assert at["time_modifier"] == 2.0
+
+
+@pytest.mark.parametrize("fields, error", [
+    ({"service_type": "window_washing"}, "Invalid service type"),
+    ({"location": "Tucson"}, "Service area not supported"),
+    ({"recurrence": "daily"}, "Unsupported recurrence: daily"),
+    ({"hours": 0}, "Hours must be positive"),
+    ({"date": "not-a-date"}, None),
+    ({"time": "25:00"}, None),
+])
+def test_quote_many_reports_errors_per_item(fields, error):
+    good, bad, also_good = make_engine().quote_many([item(), item(**fields), item(hours=1)])
+    assert "error" not in good and good["total_amount"] == 80.0
+    assert "error" not in also_good and also_good["total_amount"] == 40.0
+    assert "total_amount" not in bad
+    if error:
+        assert bad["error"] == error
+    else:
+        assert bad["error"]
+
+
+def test_quote_raises_for_invalid_item():
+    with pytest.raises(ValueError, match="Service area not supported"):
+        make_engine().quote("regular_cleaning", "Tucson", "2024-05-06", 2)
@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+
+from recurring_bookings import _add_months, occurrence_dates
+
+
+@pytest.mark.parametrize("start, months, expected", [
+    (date(2024, 1, 15), 1, date(2024, 2, 15)),
+    (date(2024, 1, 31), 1, date(2024, 2, 29)),  # leap year
+    (date(2023, 1, 31), 1, date(2023, 2, 28)),
+    (date(2024, 1, 31), 3, date(2024, 4, 30)),
+    (date(2024, 11, 30), 2, date(2025, 1, 30)),  # across the year end
+    (date(2024, 5, 31), 12, date(2025, 5, 31)),
+])
+def test_add_months_clamps_to_month_end(start, months, expected):
+    assert _add_months(start, months) == expected
+
+
+def test_monthly_rule_keeps_its_day_after_a_short_month():
+    # Each occurrence is computed from the start, so Feb 29 does not drag later months to the 29th
+    assert occurrence_dates(date(2024, 1, 31), "monthly", None, date(2024, 5, 31)) == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30), date(2024, 5, 31)
+    ]
+
+
+def test_weekly_and_biweekly_steps():
+    start, until = date(2024, 5, 6), date(2024, 6, 3)
+    assert occurrence_dates(start, "weekly", None, until) == [
+        date(2024, 5, 6), date(2024, 5, 13), date(2024, 5, 20), date(2024, 5, 27), date(2024, 6, 3)
+    ]
+    assert occurrence_dates(start, "biweekly", None, until) == [
+        date(2024, 5, 6), date(2024, 5, 20), date(2024, 6, 3)
+    ]
+
+
+def test_after_is_exclusive_and_until_inclusive():
+    start = date(2024, 5, 6)
+    assert occurrence_dates(start, "weekly", date(2024, 5, 13), date(2024, 5, 27)) == [
+        date(2024, 5, 20), date(2024, 5, 27)
+    ]
+    # Materialising up to the previous horizon again adds nothing
+    assert occurrence_dates(start, "weekly", date(2024, 5, 27), date(2024, 5, 27)) == []
+
+
+def test_until_before_start_yields_nothing():
+    assert occurrence_dates(date(2024, 5, 6), "monthly", None, date(2024, 5, 5)) == []